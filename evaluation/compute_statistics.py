@@ -9,7 +9,7 @@ import logging
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.panta.cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
+from src.panta.cfg_artifacts import ArtifactStore
 from utils import get_all_code_files, get_code_test_file_mapping, get_filename_from_path
 
 
@@ -17,9 +17,9 @@ def generate_cfg(code_file):
     file_handle = open(code_file, "r", encoding="utf-8", errors="ignore")
     src_code = file_handle.read()
     file_handle.close()
-    cfg_driver = CFGDriver(language, src_code, {"statistics": code_file})
-    testable_methods = cfg_driver.testable_methods
-    class_obj = cfg_driver.file_obj["class_objects"][0]
+    artifacts = artifact_store.get(language, src_code, {"statistics": code_file})
+    testable_methods = artifacts["testable_methods"]
+    class_obj = artifacts["file_obj"]["class_objects"][0]
     class_dec = class_obj["class_declaration"]["value"]
     return class_dec, testable_methods
 
@@ -127,6 +127,8 @@ def analyze_code_files_at_project_level(proj_path, lang):
 
 if __name__ == '__main__':
     language = sys.argv[1]
+    # the CFG artifacts are reused between the runs, keyed by the source code hash
+    artifact_store = ArtifactStore(sys.argv[2] if len(sys.argv) > 2 else os.path.join("data", "cfg-artifacts"))
     defects4j_subjects = get_d4j_subjects()
 
     subjects_file = "subject_statistics.csv"
@@ -2,7 +2,6 @@ import json
 import subprocess
 import csv
 import os
-import configparser
 import sys
 from pathlib import Path
 
@@ -57,26 +56,6 @@ def extract_config_data(src_file_obj, project_name, max_complexity, prompt_type,
     return config_data
 
 
-def fill_config(config_data, filename="config.ini"):
-    # Initialize the ConfigParser
-    config = configparser.ConfigParser()
-
-    # Load existing configuration if the file exists
-    config.read(filename)
-
-    # Update config with provided data
-    for section, settings in config_data.items():
-        if not config.has_section(section):
-            config.add_section(section)
-        for key, value in settings.items():
-            config.set(section, key, value)
-
-    # Write the config to the file
-    with open(filename, 'w') as configfile:
-        config.write(configfile)
-    print(f"Configuration written to {filename}")
-
-
 def get_d4j_subject_classes():
     d4j_subjects = {}
     with open('data/class_list.csv', 'r') as file:
@@ -97,8 +76,10 @@ def get_d4j_subject_classes():
 
 def fill_config_and_execute(src_f, proj_name, iter_num, prompt_type, model):
     config_data = extract_config_data(src_f, proj_name, iter_num, prompt_type, model)
-    fill_config(config_data, filename="../src/panta/config.ini")
-    cmd = ["python", "-m", "panta.main"]  # Example: Python script execution
+    # the class is passed as config overrides, the shared config.ini is never rewritten
+    cmd = ["python", "-m", "panta.main"]
+    for key, value in config_data['default'].items():
+        cmd += ["--set", f"{key}={value}"]
     process = subprocess.Popen(cmd, cwd="../", stdout=subprocess.PIPE, text=True)
     for line in process.stdout:
         print(line, end='')
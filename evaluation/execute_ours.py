@@ -2,7 +2,6 @@ import json
 import subprocess
 import csv
 import os
-import configparser
 import sys
 from pathlib import Path
 
@@ -59,26 +58,6 @@ def extract_config_data(src_file_obj, project_name, max_complexity, prompt_type,
     return config_data
 
 
-def fill_config(config_data, filename="config.ini"):
-    # Initialize the ConfigParser
-    config = configparser.ConfigParser()
-
-    # Load existing configuration if the file exists
-    config.read(filename)
-
-    # Update config with provided data
-    for section, settings in config_data.items():
-        if not config.has_section(section):
-            config.add_section(section)
-        for key, value in settings.items():
-            config.set(section, key, value)
-
-    # Write the config to the file
-    with open(filename, 'w') as configfile:
-        config.write(configfile)
-    print(f"Configuration written to {filename}")
-
-
 def get_d4j_subject_classes():
     d4j_subjects = {}
     with open('data/class_list.csv', 'r') as file:
@@ -99,8 +78,23 @@ def get_d4j_subject_classes():
 
 def fill_config_and_execute(src_f, proj_name, iter_num, prompt_type, model):
     config_data = extract_config_data(src_f, proj_name, iter_num, prompt_type, model)
-    fill_config(config_data, filename="../src/panta/config.ini")
-    cmd = ["python", "-m", "panta.main"]  # Example: Python script execution
+    # the class is passed as config overrides, the shared config.ini is never rewritten
+    cmd = ["python", "-m", "panta.main"]
+    for key, value in config_data['default'].items():
+        cmd += ["--set", f"{key}={value}"]
+    process = subprocess.Popen(cmd, cwd="../", stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        print(line, end='')
+
+    exit_code = process.wait()
+    print("Exit Code:", exit_code)
+
+
+def execute_batch(manifest_entries, manifest_file="batch_manifest.json"):
+    # all the classes are processed by one panta process, the config.ini values are the defaults of the entries
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest_entries, f, indent=2)
+    cmd = ["python", "-m", "panta.batch", os.path.abspath(manifest_file)]
     process = subprocess.Popen(cmd, cwd="../", stdout=subprocess.PIPE, text=True)
     for line in process.stdout:
         print(line, end='')
@@ -113,6 +107,9 @@ if __name__ == '__main__':
     defects4j_subject_classes = get_d4j_subject_classes()
     prompt = sys.argv[1]
     model = sys.argv[2]
+    # "batch": run all the classes in a single panta process
+    batch_mode = len(sys.argv) > 3 and sys.argv[3] == "batch"
+    manifest_entries = []
     result_path = os.path.join(ROOT, f"result-files/{prompt}_{model}")
     defects4j_subjects = ["JacksonXml-5f", "Csv-16f", "Collections-28f", "Gson-16f", "Cli-40f", "JacksonCore-26f",
                           "JxPath-22f", "Jsoup-93f", "Codec-18f", "Compress-47f", "JacksonDatabind-112f",
@@ -163,8 +160,15 @@ if __name__ == '__main__':
                 max_cc = class_subjects[src_file["src_name"]]
                 executed_count += 1
                 if not os.path.exists(html_file):
+                    if batch_mode:
+                        config_data = extract_config_data(src_file, p_name, max_cc, prompt, model)
+                        manifest_entries.append(config_data['default'])
+                        continue
                     print(f"Executing [{executed_count}/{total_samples}] {src_file['src_name']} (Complexity: {max_cc})")
                     fill_config_and_execute(src_file, p_name, max_cc, prompt, model)
+
+    if batch_mode and manifest_entries:
+        execute_batch(manifest_entries)
     
     print("\n" + "=" * 60)
     print(f"Evaluation Complete! Processed {executed_count} samples in total")
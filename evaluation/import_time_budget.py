@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+# the harness starts one panta process per class, the import of panta.main must stay cheap
+DEFAULT_BUDGET_MS = 500
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def measure_import_time(module):
+    """
+    import the module in a fresh interpreter with `-X importtime`
+    :return: list of (module, self time in us, cumulative time in us) in import order
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True, env=env)
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n{process.stderr[-2000:]}")
+
+    timings = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+if __name__ == '__main__':
+    module = sys.argv[1] if len(sys.argv) > 1 else "panta.main"
+    budget_ms = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BUDGET_MS
+
+    timings = measure_import_time(module)
+    total_ms = next(cumulative for name, _, cumulative in timings if name == module) / 1000
+    print("slowest imports (self time):")
+    for name, self_us, cumulative_us in sorted(timings, key=lambda timing: timing[1], reverse=True)[:10]:
+        print(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms  {name}")
+    print(f"import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    if total_ms > budget_ms:
+        sys.exit(1)
@@ -0,0 +1,164 @@
+import argparse
+import configparser
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from execute_ours import extract_config_data, get_d4j_subject_classes
+
+ROOT = Path(__file__).resolve().parents[1]
+BASE_CONFIG = os.path.join(ROOT, "src", "panta", "config.ini")
+DEFECTS4J_SUBJECTS = ["JacksonXml-5f", "Csv-16f", "Collections-28f", "Gson-16f", "Cli-40f", "JacksonCore-26f",
+                      "JxPath-22f", "Jsoup-93f", "Codec-18f", "Compress-47f", "JacksonDatabind-112f",
+                      "Time-13f", "Lang-4f", "Math-2f"]
+# written by the build, copied into the sandboxes instead of being hardlinked
+BUILD_OUTPUT_DIRS = ("target",)
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def create_sandbox(project_dir, sandbox_dir):
+    """
+    copy the project for one job, the sources are hardlinked and the build output is copied,
+    the generated test file is written by the job so it never shares the inode with the project
+    """
+    shutil.copytree(project_dir, sandbox_dir, copy_function=link_or_copy, symlinks=True,
+                    ignore=shutil.ignore_patterns(".git", *BUILD_OUTPUT_DIRS))
+    for build_dir in BUILD_OUTPUT_DIRS:
+        if os.path.isdir(os.path.join(project_dir, build_dir)):
+            shutil.copytree(os.path.join(project_dir, build_dir), os.path.join(sandbox_dir, build_dir), symlinks=True)
+
+
+def in_sandbox(path, project_dir, sandbox_dir):
+    return os.path.join(sandbox_dir, os.path.relpath(os.path.join(ROOT, path), os.path.join(ROOT, project_dir)))
+
+
+def write_job_config(config_data, config_file):
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(BASE_CONFIG)
+    for key, value in config_data.items():
+        config.set("default", key, value)
+    with open(config_file, 'w') as f:
+        config.write(f)
+
+
+def collect_jobs(prompt, model, work_dir):
+    """
+    :return: the jobs of the classes in `data/class_list.csv` which do not have a result file yet
+    """
+    subject_classes = get_d4j_subject_classes()
+    result_path = os.path.join(ROOT, f"result-files/{prompt}_{model}")
+    jobs = []
+    for p_name in DEFECTS4J_SUBJECTS:
+        with open(os.path.join("defects4j-codefiles", f"{p_name}-codefiles.json"), 'r') as f:
+            data = json.load(f)
+        file_objects = data["src_test_exact_match"] + data["src_test_fuzz_match"] + data["src_without_tests"]
+        class_subjects = subject_classes[p_name]
+        for src_file in file_objects:
+            if src_file["src_name"] not in class_subjects:
+                continue
+            html_file = f"{result_path}/{src_file['src_name']}_{prompt}_test_results.html"
+            if os.path.exists(html_file):
+                continue
+            job_id = f"{p_name}_{src_file['src_name']}"
+            jobs.append({"id": job_id, "project": p_name, "src_file": src_file,
+                         "max_cc": class_subjects[src_file["src_name"]], "job_dir": os.path.join(work_dir, job_id)})
+    return jobs
+
+
+def kill_process_groups(process_groups_dir):
+    """
+    kill the builds which are still running after the job was killed or crashed
+    """
+    for process_group in os.listdir(process_groups_dir):
+        try:
+            os.killpg(int(process_group), signal.SIGKILL)
+        except (ValueError, ProcessLookupError, PermissionError):
+            pass
+
+
+def run_job(job, prompt, model, timeout, keep_sandbox=False):
+    job_dir = job["job_dir"]
+    shutil.rmtree(job_dir, ignore_errors=True)
+    os.makedirs(job_dir)
+
+    config_data = extract_config_data(job["src_file"], job["project"], job["max_cc"], prompt, model)["default"]
+    project_dir = config_data["project_directory"]
+    sandbox_dir = os.path.join(job_dir, "project")
+    create_sandbox(os.path.join(ROOT, project_dir), sandbox_dir)
+    for key in ("source_code_file", "test_code_file", "code_coverage_report_path"):
+        config_data[key] = in_sandbox(config_data[key], project_dir, sandbox_dir)
+    config_data["project_directory"] = sandbox_dir
+    config_data["test_code_command_dir"] = sandbox_dir
+    config_data["test_file_output_path"] = ""
+    if os.path.exists(config_data["test_code_file"]):
+        os.remove(config_data["test_code_file"])
+    config_file = os.path.join(job_dir, "config.ini")
+    write_job_config(config_data, config_file)
+
+    # the builds run in their own sessions, panta records their process groups to be killed with the job
+    process_groups_dir = os.path.join(job_dir, "process_groups")
+    os.makedirs(process_groups_dir)
+
+    time_start = time.time()
+    with open(os.path.join(job_dir, "panta.out"), "w") as output:
+        # own process group, so that the maven processes are killed with the job on timeout
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.join(ROOT, "src"),
+                                                                         os.environ.get("PYTHONPATH")])),
+                   PANTA_PROCESS_GROUPS_DIR=process_groups_dir)
+        process = subprocess.Popen([sys.executable, "-m", "panta.main", "--config", config_file],
+                                   cwd=ROOT, env=env, stdout=output, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+        try:
+            exit_code = process.wait(timeout=timeout)
+            status = "DONE" if exit_code == 0 else f"FAIL ({exit_code})"
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            status = "TIMEOUT"
+        kill_process_groups(process_groups_dir)
+
+    if os.path.exists(config_data["test_code_file"]):
+        shutil.copy(config_data["test_code_file"], job_dir)
+    if not keep_sandbox:
+        shutil.rmtree(sandbox_dir, ignore_errors=True)
+    return {"id": job["id"], "status": status, "duration": round(time.time() - time_start, 2)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the evaluation classes concurrently, one sandbox per job.")
+    parser.add_argument("prompt")
+    parser.add_argument("model")
+    parser.add_argument("--jobs", type=int, default=4, help="number of classes processed at the same time")
+    parser.add_argument("--timeout", type=int, default=3 * 3600, help="timeout of a class in seconds")
+    parser.add_argument("--work-dir", default="scheduler-jobs", help="directory of the job configs, logs and sandboxes")
+    parser.add_argument("--keep-sandbox", action="store_true", help="keep the project copy of each job")
+    args = parser.parse_args()
+
+    jobs = collect_jobs(args.prompt, args.model, os.path.abspath(args.work_dir))
+    print(f"{len(jobs)} classes to process with {args.jobs} concurrent jobs")
+    results = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(run_job, job, args.prompt, args.model, args.timeout, args.keep_sandbox): job
+                   for job in jobs}
+        for index, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"id": futures[future]["id"], "status": f"ERROR ({e})", "duration": 0}
+            results.append(result)
+            print(f"[{index}/{len(jobs)}] {result['id']}: {result['status']} in {result['duration']}s")
+
+    with open(os.path.join(args.work_dir, "summary.json"), 'w') as f:
+        json.dump(results, f, indent=2)
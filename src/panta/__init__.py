@@ -1,3 +1,10 @@
 # src/panta/__init__.py
-from .panta import Panta
 __all__ = ["Panta"]
+
+
+def __getattr__(name):
+    # Panta pulls the whole pipeline, it is imported on first access so that `panta.<module>` stays cheap
+    if name == "Panta":
+        from .panta import Panta
+        return Panta
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
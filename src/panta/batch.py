@@ -0,0 +1,111 @@
+"""
+Batch mode: generate the tests of several classes in one process.
+The manifest is a json list of entries, each entry overrides the keys of config.ini for one class, e.g.
+[{"project_directory": "...", "source_code_file": "...", "test_code_file": "...", "test_execution_command": "..."}]
+The test dependencies of a project, the CFG cache, the LLM response cache and the LLM client are shared
+between the entries instead of being rebuilt for every class.
+"""
+import argparse
+import configparser
+import json
+import os
+import time
+
+from .main import load_config, config_to_namespace, parse_overrides
+from .panta import Panta
+from .panta_logger import pantaLogger
+
+logger = pantaLogger.initialize_logger(__name__)
+
+
+def load_manifest(manifest_path):
+    with open(manifest_path, "r") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"The manifest {manifest_path} must contain a list of entries.")
+    return entries
+
+
+def entry_config(base_config, entry: dict):
+    """
+    :return: the config section of config.ini with the values of the manifest entry
+    """
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_dict({"default": dict(base_config)})
+    config.read_dict({"default": {key: str(value) for key, value in entry.items()}})
+    return config["default"]
+
+
+class BatchRunner:
+    def __init__(self, base_config):
+        self.base_config = base_config
+        # keyed by (test dependency command, command directory)
+        self.test_dependencies = {}
+        # keyed by (cache directory, mode, max size)
+        self.response_caches = {}
+        # keyed by (model, print tokens, response cache)
+        self.llm_invokers = {}
+
+    def create_panta(self, args) -> Panta:
+        dependency_key = (args.test_dependency_command, os.path.abspath(args.test_code_command_dir or "."))
+        cache_key = (os.path.abspath(args.llm_cache_dir), args.llm_cache_mode, args.llm_cache_max_mb)
+        invoker_key = (args.model, args.llm_print_tokens, cache_key)
+        panta = Panta(args,
+                      test_dependencies=self.test_dependencies.get(dependency_key),
+                      response_cache=self.response_caches.get(cache_key),
+                      llm_invoker=self.llm_invokers.get(invoker_key))
+        self.test_dependencies[dependency_key] = panta.test_dependencies
+        self.response_caches[cache_key] = panta.response_cache
+        self.llm_invokers[invoker_key] = panta.test_gen.llm_invoker
+        return panta
+
+    def run_entry(self, entry: dict) -> dict:
+        args = config_to_namespace(entry_config(self.base_config, entry))
+        time_start = time.time()
+        try:
+            panta = self.create_panta(args)
+            if args.run_symprompt:
+                panta.run_symprompt()
+            else:
+                panta.run()
+            status = "DONE"
+            line_coverage, branch_coverage = panta.test_gen.current_coverage or (0, 0)
+        except Exception as e:
+            logger.error(f"Test generation failed for {args.source_code_file}: {e}")
+            status, line_coverage, branch_coverage = f"FAIL: {e}", 0, 0
+        return {
+            "source_code_file": args.source_code_file,
+            "status": status,
+            "line_coverage": round(line_coverage * 100, 2),
+            "branch_coverage": round(branch_coverage * 100, 2),
+            "duration": round(time.time() - time_start, 2),
+        }
+
+    def run(self, entries: list) -> list:
+        results = []
+        for index, entry in enumerate(entries):
+            logger.info(f"Batch [{index + 1}/{len(entries)}]: {entry.get('source_code_file')}")
+            results.append(self.run_entry(entry))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the tests of the classes of a manifest in one process.")
+    parser.add_argument("manifest", help="json list of config.ini overrides, one entry per class")
+    parser.add_argument("--summary", default="", help="json file to write the status of each entry to")
+    parser.add_argument("--config", default=None, help="config file to use instead of panta/config.ini")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a value of the config file for all the entries, can be repeated")
+    cli_args = parser.parse_args()
+
+    results = BatchRunner(load_config(cli_args.config, parse_overrides(cli_args.overrides))).run(load_manifest(cli_args.manifest))
+    for result in results:
+        logger.info(f"{result['source_code_file']}: {result['status']}, line coverage {result['line_coverage']}%, "
+                    f"branch coverage {result['branch_coverage']}%")
+    if cli_args.summary:
+        with open(cli_args.summary, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
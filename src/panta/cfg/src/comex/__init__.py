@@ -1,37 +1,62 @@
+__version__ = "0.1.4"
+
+import fcntl
+import hashlib
 import shutil
 import tempfile
-from tree_sitter import Language
 import os
 import subprocess
 
 
-def get_language_map():
-    clone_directory = os.path.join(tempfile.gettempdir(), "comex")
-    shared_languages = os.path.join(clone_directory, "languages.so")
-
-    # ("https://github.com/tree-sitter/tree-sitter-c-sharp", "3ef3f7f99e16e528e6689eae44dff35150993307")
-    grammar_repos = [
-        ("https://github.com/tree-sitter/tree-sitter-java", "09d650def6cdf7f479f4b78f595e9ef5b58ce31e"),
-        ("https://github.com/tree-sitter/tree-sitter-python", "c01fb4e38587e959b9058b8cd34b9e6a3068c827")
-    ]
-    vendor_languages = []
+# ("https://github.com/tree-sitter/tree-sitter-c-sharp", "3ef3f7f99e16e528e6689eae44dff35150993307")
+GRAMMAR_REPOS = [
+    ("https://github.com/tree-sitter/tree-sitter-java", "09d650def6cdf7f479f4b78f595e9ef5b58ce31e"),
+    ("https://github.com/tree-sitter/tree-sitter-python", "c01fb4e38587e959b9058b8cd34b9e6a3068c827")
+]
+LANGUAGES = ["python", "java"]
+# the pinned grammars of the shared library, stored next to it when it is built
+BUILD_ID = hashlib.sha256("\n".join(f"{url}@{commit}" for url, commit in GRAMMAR_REPOS).encode()).hexdigest()
+
+_language_map = None
+
+
+def get_build_directory():
+    """
+    directory of the prebuilt languages.so, set `COMEX_BUILD_DIR` to use a library built ahead of time
+    """
+    return os.environ.get("COMEX_BUILD_DIR") or os.path.join(tempfile.gettempdir(), "comex")
+
+
+def read_build_id(build_directory):
+    try:
+        with open(os.path.join(build_directory, "build_id"), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def checked_out_commit(vendor_language):
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=vendor_language,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
 
-    for url, commit in grammar_repos:
+def fetch_grammars(clone_directory):
+    """
+    check out the pinned commit of each grammar, the checkouts of another commit are fetched again
+    """
+    vendor_languages = []
+    for url, commit in GRAMMAR_REPOS:
         grammar = url.rstrip("/").split("/")[-1]
         vendor_language = os.path.join(clone_directory, grammar)
         vendor_parser = os.path.join(vendor_language, "src", "parser.c")
         vendor_languages.append(vendor_language)
-        if os.path.isfile(shared_languages) and not os.path.isfile(vendor_parser):
-            os.remove(shared_languages)
-            print(f"{vendor_parser} does not exist...")
-        elif not os.path.isfile(shared_languages) and os.path.isfile(vendor_parser):
-            shutil.rmtree(vendor_language)
-            print(f"{shared_languages} does not exist...")
-        elif not os.path.isfile(shared_languages) and not os.path.isfile(vendor_parser):
-            print(f"{shared_languages} and {vendor_parser} do not exist...")
-        else:
+        if os.path.isfile(vendor_parser) and checked_out_commit(vendor_language) == commit:
             continue
-        print(f"Intial Setup: First time running COMEX on {grammar}")
+        print(f"Intial Setup: checking out {grammar} at {commit}")
+        shutil.rmtree(vendor_language, ignore_errors=True)
         os.makedirs(vendor_language, exist_ok=True)
 
         commands = [["git", "init"],
@@ -45,49 +70,67 @@ def get_language_map():
                 print(f"Command '{' '.join(command)}' succeeded.")
             except subprocess.CalledProcessError as e:
                 print(f"Command '{' '.join(command)}' failed with exit code {e.returncode}.")
+        if checked_out_commit(vendor_language) != commit:
+            raise RuntimeError(f"Could not check out {url} at {commit} in {vendor_language}")
+    return vendor_languages
+
+
+def is_built(build_directory):
+    return (os.path.isfile(os.path.join(build_directory, "languages.so"))
+            and read_build_id(build_directory) == BUILD_ID)
+
+
+def build_language_library(build_directory=None):
+    """
+    fetch the pinned grammars and build the shared library with its build id, ahead of time:
+    `python -m panta.cfg.src.comex.build_languages [build_directory]`
+    The build directory is shared by the parallel runs, the library is built under a lock and renamed into place,
+    so the other runs never load a partially written library.
+    """
+    build_directory = build_directory or get_build_directory()
+    shared_languages = os.path.join(build_directory, "languages.so")
+    os.makedirs(build_directory, exist_ok=True)
+    from tree_sitter import Language
+    with open(os.path.join(build_directory, "build.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # another run may have built it while we were waiting for the lock
+        if is_built(build_directory):
+            return shared_languages
+        vendor_languages = fetch_grammars(build_directory)
+        temporary_languages = f"{shared_languages}.{os.getpid()}.tmp"
+        try:
+            Language.build_library(temporary_languages, vendor_languages)
+            os.replace(temporary_languages, shared_languages)
+        finally:
+            if os.path.exists(temporary_languages):
+                os.remove(temporary_languages)
+        temporary_build_id = os.path.join(build_directory, f"build_id.{os.getpid()}.tmp")
+        with open(temporary_build_id, "w") as f:
+            f.write(BUILD_ID)
+        os.replace(temporary_build_id, os.path.join(build_directory, "build_id"))
+    return shared_languages
+
+
+def get_language_map():
+    """
+    load the languages from the prebuilt shared library, it is only built when it is missing
+    or was built from other grammars than the pinned ones.
+    """
+    global _language_map
+    if _language_map is not None:
+        return _language_map
+    from tree_sitter import Language
+
+    build_directory = get_build_directory()
+    shared_languages = os.path.join(build_directory, "languages.so")
+    if not is_built(build_directory):
+        print(f"{shared_languages} does not exist or was built from other grammars, building it...")
+        shared_languages = build_language_library(build_directory)
 
-    # build_id = ""
-    # for vendor_language in vendor_languages:
-    #     commit_hash = get_commit_hash(vendor_language)
-    #     if commit_hash:
-    #         build_id += commit_hash
-    #     else:
-    #         build_id += "ERROR"
-    # build_id_file = os.path.join(clone_directory, "build_id")
-    #
-    # # check if the build_id is the same as the one stored in the file
-    # # if not, rebuild the shared library
-    # if os.path.exists(build_id_file):
-    #     with open(build_id_file, "r") as f:
-    #         stored_build_id = f.read()
-    #     if build_id != stored_build_id:
-    #         os.remove(shared_languages)
-    # else:
-    #     if os.path.exists(shared_languages):
-    #         os.remove(shared_languages)
-
-    Language.build_library(
-        # Store the library in the `build` directory
-        shared_languages,
-        vendor_languages,
-    )
-    PYTHON_LANGUAGE = Language(shared_languages, "python")
-    JAVA_LANGUAGE = Language(shared_languages, "java")
     # C_SHARP_LANGUAGE = Language(shared_languages, "c_sharp")
     # RUBY_LANGUAGE = Language("build/my-languages.so", "ruby")
     # GO_LANGUAGE = Language("build/my-languages.so", "go")
     # PHP_LANGUAGE = Language("build/my-languages.so", "php")
     # JAVASCRIPT_LANGUAGE = Language("build/my-languages.so", "javascript")
-
-    # with open(build_id_file, "w") as f:
-    #     f.write(build_id)
-
-    return {
-        "python": PYTHON_LANGUAGE,
-        "java": JAVA_LANGUAGE,
-        # "cs": C_SHARP_LANGUAGE,
-        # "ruby": RUBY_LANGUAGE,
-        # "go": GO_LANGUAGE,
-        # "php": PHP_LANGUAGE,
-        # "javascript": JAVASCRIPT_LANGUAGE,
-    }
+    _language_map = {language: Language(shared_languages, language) for language in LANGUAGES}
+    return _language_map
@@ -0,0 +1,7 @@
+"""Build the tree-sitter languages ahead of time, so that the parsers only load the shared library"""
+import sys
+
+from . import build_language_library
+
+if __name__ == "__main__":
+    print(build_language_library(sys.argv[1] if len(sys.argv) > 1 else None))
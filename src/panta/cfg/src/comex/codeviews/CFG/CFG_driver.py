@@ -3,7 +3,8 @@ from .CFG_csharp import CFGGraph_csharp
 from .CFG_java import CFGGraph_java
 from ...tree_parser.parser_driver import ParserDriver
 import networkx as nx
-from ...utils.timeout import timeout_function
+from collections import deque
+from types import SimpleNamespace
 from  networkx.classes.multidigraph import MultiDiGraph
 
 def to_networkx_simple(edge_list):
@@ -14,48 +15,59 @@ def to_networkx_simple(edge_list):
     return G
 
 
-def find_paths(G, source, target):
-    visited = {edge: False for edge in G.edges()}
-    queue = []
-    paths = []
-    queue.append([source])
-    while len(queue):
-        for i in range(len(queue)):
-            current_path = queue.pop(0)
-            for next_node in G.successors(current_path[-1]):
-                next_path = current_path.copy()
-                next_path.append(next_node)
-
-                if next_node is target:
-                    new_edges = []
-                    for j in range(len(next_path) - 1):
-                        if not visited[(next_path[j], next_path[j + 1])]:
-                            new_edges.append((next_path[j], next_path[j + 1]))
-                            visited[(next_path[j], next_path[j + 1])] = True
-                    if len(new_edges):
-                        paths.append(next_path)
-
-                    if all([visited[edge] for edge in visited.keys()]):
-                        return paths
-                else:
-                    queue.append(next_path)
-
-    return paths
+def bfs_tree(adjacency, root):
+    """
+    breadth first search from the root
+    :return: dict mapping each reached node to its parent in the BFS tree (None for the root)
+    """
+    parents = {root: None}
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        for next_node in adjacency[node]:
+            if next_node not in parents:
+                parents[next_node] = node
+                queue.append(next_node)
+    return parents
+
+
+def tree_path(parents, node):
+    """
+    :return: the nodes from the root of the tree to the node
+    """
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
 
 
-def identify_independent_paths(edges, paths):
-    visited = {edge: False for edge in edges}
-    independent_paths = []
-    for path in paths:
-        path_edges = [(path[i], path[i + 1]) for i in range(len(path) - 1)]
-        unique_edges = []
-        for edge in path_edges:
-            if not visited.get(edge):
-                unique_edges.append(edge)
-                visited[edge] = True
-        if len(unique_edges):
-            independent_paths.append(path)
-    return independent_paths
+def find_paths(G, source, target):
+    """
+    basis paths of the control flow graph from the source to the target.
+    The first path is the shortest path to the target, then one path per edge out of the BFS tree rooted at
+    the source: the tree path to the edge, the edge and the shortest path from the edge to the target.
+    The paths are returned in the breadth first order of the nodes of the source tree, not sorted by distance.
+    There is one path per edge out of the tree plus the first one, so there are E - N + 2 of them
+    (the cyclomatic complexity) when every node is on a path from the source to the target.
+    """
+    if source not in G or target not in G:
+        return []
+    prefix_tree = bfs_tree(G.succ, source)
+    suffix_tree = bfs_tree(G.pred, target)
+    if target not in prefix_tree:
+        return []
+
+    paths = [tree_path(prefix_tree, target)]
+    for node in prefix_tree:
+        for next_node in G.succ[node]:
+            if prefix_tree[next_node] == node or next_node not in suffix_tree:
+                continue
+            suffix = tree_path(suffix_tree, next_node)
+            suffix.reverse()
+            paths.append(tree_path(prefix_tree, node) + suffix)
+    return paths
 
 
 def calculate_cyclomatic_complexity(cfg: MultiDiGraph):
@@ -72,7 +84,10 @@ class CFGDriver:
     ):
         self.src_language = src_language
 
-        self.parser = ParserDriver(src_language, src_code).parser
+        parser_driver = ParserDriver(src_language, src_code)
+        self.parser = parser_driver.parser
+        # lines of the source code without comments -> original lines
+        self.line_map = parser_driver.line_map
         self.root_node = self.parser.root_node
         self.src_code = self.parser.src_code
         self.properties = properties
@@ -96,8 +111,15 @@ class CFGDriver:
 
         self.CFG_nodes = self.CFG.CFG_node_list
         self.CFG_node_ids = [node[0] for node in self.CFG_nodes]
+        # position of each node in CFG_node_ids
+        self.CFG_node_index = {node_id: index for index, node_id in enumerate(self.CFG_node_ids)}
         self.CFG_node_map = {node[0]: (node[2], self.node_type_map.get(node[1])) for node in self.CFG_nodes}
         self.CFG_edge_map = {(edge[0], edge[1]): edge[2] for edge in self.CFG.CFG_edge_list}
+        # outgoing edges of each node, in the order of CFG_edge_map
+        self.CFG_out_edges = {}
+        for edge in self.CFG_edge_map.keys():
+            self.CFG_out_edges.setdefault(edge[0], []).append(edge)
+        self.CFG_edge_index = {edge: index for index, edge in enumerate(self.CFG_edge_map.keys())}
 
         self.return_statement_map = self.CFG.records["return_statement_map"]
         self.basic_blocks = self.CFG.records["basic_blocks"]
@@ -108,6 +130,14 @@ class CFGDriver:
                                     if x[0][0] in self.class_list.keys()}
         self.methods_under_test, self.testable_methods = self.filter_method_under_tests()
 
+        # lookups of the path extraction, shared by all the methods of the file
+        self.method_calls = self.get_method_calls_for_each_statement()
+        self.method_decl_index = self.get_method_declaration_index()
+        self.basic_block_index = {}
+        for block in self.basic_blocks.values():
+            for node_id in block:
+                self.basic_block_index.setdefault(node_id, block)
+
         self.edge_label_map = {
             "neg_next": False,
             "pos_next": True,
@@ -122,14 +152,28 @@ class CFGDriver:
 
         self.file_obj = self.generate_file_obj()
 
+    def __getstate__(self):
+        # the tree-sitter objects cannot be pickled, only keep the CFG records
+        state = self.__dict__.copy()
+        state["parser"] = None
+        state["root_node"] = None
+        state["CFG"] = SimpleNamespace(
+            graph=self.CFG.graph,
+            CFG_node_list=self.CFG.CFG_node_list,
+            CFG_edge_list=self.CFG.CFG_edge_list,
+            records=self.CFG.records,
+            statement_types=self.CFG.statement_types,
+        )
+        return state
+
     def generate_file_obj(self):
         f_obj = {"imports": [], "class_objects": []}
         import_start_id = len(self.CFG_node_ids)
         for clz_name, clz_id in self.class_list.items():
             clz_node = self.CFG_node_map[clz_id][0]
-            idx_1 = self.CFG_node_ids.index(clz_id)
+            idx_1 = self.CFG_node_index[clz_id]
             import_start_id = min(idx_1, import_start_id)
-            idx_2 = self.CFG_node_ids.index(max(self.return_statement_map[clz_id]))
+            idx_2 = self.CFG_node_index[max(self.return_statement_map[clz_id])]
 
             fields = [{"id": node, "value": self.CFG_node_map[node][0]} for node in self.CFG_node_ids[idx_1: idx_2 + 1]
                       if self.CFG_node_map[node][1] == "field_declaration"]
@@ -165,25 +209,20 @@ class CFGDriver:
         :param method: method is a tuple (start_id, last_node_id, method_graph, method_name, cyc_complexity, clz_name)
         :return:
         """
-        method_calls = self.get_method_calls_for_each_statement()
-        method_decls = [(x, y[0][1], y[1]) for x, y in self.method_declarations.items()]
-        sorted_method_decls = sorted(method_decls, key=lambda x: x[0])
-        # print(sorted_method_decls)
+        method_calls = self.method_calls
         source_id = method[0]
         last_id = method[1]
         sub_graph = method[2]
-        node_ids = self.CFG_node_ids[self.CFG_node_ids.index(source_id): self.CFG_node_ids.index(last_id) + 1]
+        node_ids = self.CFG_node_ids[self.CFG_node_index[source_id]: self.CFG_node_index[last_id] + 1]
 
         method_obj = {"method_declaration": {"id": source_id, "nodes": node_ids,
                                              "value": self.CFG_node_map[source_id][0], "name": method[3],
                                              "complexity": method[4]}, "paths": []}
-        paths = timeout_function(5, find_paths, sub_graph, source_id, target=self.dummy_exit)
+        paths = find_paths(sub_graph, source_id, target=self.dummy_exit)
         if not len(paths):
             print(method[5], method[3], method[2].edges())
-        edges = [e for e in sub_graph.edges()]
-        independent_paths = identify_independent_paths(edges, paths)
 
-        for index, path in enumerate(independent_paths):
+        for index, path in enumerate(paths):
             path_arr = []
             true_blocks = []
             # false_branches = []
@@ -197,15 +236,7 @@ class CFGDriver:
                 stat_str = {"id": edge[0], "statement": node_label, "conditional": None}
 
                 if method_calls["inside"].get(edge[0]):
-                    mthds = []
-                    for m in method_calls["inside"].get(edge[0]):
-                        for idx, item in enumerate(sorted_method_decls):
-                            if item[1] == m[1]:
-                                next_node_id = sorted_method_decls[idx + 1][0] if idx < len(sorted_method_decls) - 1 \
-                                    else None
-                                mthds.append(f"{m[0]}, {item[0]}, {next_node_id}")
-
-                    inside_calls.update(mthds)
+                    inside_calls.update(self.get_inside_calls(edge[0]))
 
                 if method_calls["outside"].get(edge[0]):
                     methods = [m[0] for m in method_calls["outside"].get(edge[0])]
@@ -213,11 +244,7 @@ class CFGDriver:
 
                 if edge_label == "pos_next":
                     node = edge[1]
-                    block_nodes = []
-                    for idx, block in self.basic_blocks.items():
-                        if node in block:
-                            block_nodes = block
-                            break
+                    block_nodes = self.basic_block_index.get(node, [])
 
                     block = [{"id": node_id, "statement": self.CFG_node_map.get(node_id)[0]} for node_id in block_nodes]
                     true_blocks.append(
@@ -243,14 +270,7 @@ class CFGDriver:
             path_arr.append({"id": last_node_id, "statement": self.CFG_node_map.get(last_node_id)[0],
                              "conditional": None})
             if method_calls["inside"].get(last_node_id):
-                mthds = []
-                for m in method_calls["inside"].get(last_node_id):
-                    for idx, item in enumerate(sorted_method_decls):
-                        if item[1] == m[1]:
-                            next_node_id = sorted_method_decls[idx + 1][0] if idx < len(sorted_method_decls) - 1 \
-                                else None
-                            mthds.append(f"{m[0]}, {item[0]}, {next_node_id}")
-                inside_calls.update(mthds)
+                inside_calls.update(self.get_inside_calls(last_node_id))
             if method_calls["outside"].get(last_node_id):
                 methods = [m[0] for m in method_calls["outside"].get(last_node_id)]
                 outside_calls.update(methods)
@@ -261,6 +281,26 @@ class CFGDriver:
                  "method_calls_outside_class": list(outside_calls)})
         return method_obj
 
+    def get_method_declaration_index(self):
+        """
+        :return: dict mapping a method name to the (declaration id, next declaration id) of its overloads,
+        ordered by declaration id
+        """
+        sorted_method_decls = sorted(self.method_declarations.keys())
+        method_decl_index = {}
+        for idx, decl_id in enumerate(sorted_method_decls):
+            next_node_id = sorted_method_decls[idx + 1] if idx < len(sorted_method_decls) - 1 else None
+            method_name = self.method_declarations[decl_id][0][1]
+            method_decl_index.setdefault(method_name, []).append((decl_id, next_node_id))
+        return method_decl_index
+
+    def get_inside_calls(self, node_id):
+        """
+        calls of the statement to the methods of the class, as "call, declaration id, next declaration id"
+        """
+        return [f"{m[0]}, {decl_id}, {next_node_id}" for m in self.method_calls["inside"].get(node_id, [])
+                for decl_id, next_node_id in self.method_decl_index.get(m[1], [])]
+
     def get_method_calls_for_each_statement(self):
         method_calls = {"outside": {}, "inside": {}}
         method_calls_outside = {x: y for x, y in self.CFG.records["function_calls"].items()
@@ -342,13 +382,12 @@ class CFGDriver:
 
                             if "statistics" in self.properties.keys():
                                 if cyc_complexity > 0:
-                                    paths = timeout_function(5, find_paths, method_graph, start_id, target=self.dummy_exit)
-                                    edges = [e for e in method_graph.edges()]
-                                    independent_paths = identify_independent_paths(edges, paths)
+                                    paths = find_paths(method_graph, start_id, target=self.dummy_exit)
+                                    independent_paths = paths
 
                                     if not len(paths):
                                         with open("debug.txt", "a") as f:
-                                            f.write(f" time out: {self.properties['statistics']}: {method_name}\n")
+                                            f.write(f" no path: {self.properties['statistics']}: {method_name}\n")
                                     elif len(paths) != cyc_complexity:
                                         with open("debug.txt", "a") as f:
                                             f.write(f" not equal: {self.properties['statistics']}: {method_name}\n")
@@ -380,7 +419,9 @@ class CFGDriver:
 
     def generate_method_control_flow_graph(self, node_ids, return_nodes, start_id):
 
-        edges = [edge for edge in self.CFG_edge_map.keys() if edge[0] in node_ids and edge[1] in node_ids]
+        node_set = set(node_ids)
+        edges = [edge for node_id in node_set for edge in self.CFG_out_edges.get(node_id, ()) if edge[1] in node_set]
+        edges.sort(key=self.CFG_edge_index.get)
 
         method_graph = to_networkx_simple(edges)
         end_nodes = set()
@@ -400,7 +441,7 @@ class CFGDriver:
              method_graph.add_edge(node_id, self.dummy_exit)
         for node_id in inner_methods:
             # inner method
-            node_index = self.CFG_node_ids.index(node_id)
+            node_index = self.CFG_node_index[node_id]
             parent_node = self.CFG_node_ids[node_index - 1]
             method_graph.add_edge(parent_node, node_id)
             return_stats = self.return_statement_map[node_id]
@@ -423,9 +464,9 @@ class CFGDriver:
         return unreachable_nodes
 
     def get_method_nodes(self, start_node):
-        start_node_index = self.CFG_node_ids.index(start_node)
+        start_node_index = self.CFG_node_index[start_node]
         last_node_id = max(self.return_statement_map[start_node])
-        last_node_index = self.CFG_node_ids.index(last_node_id)
+        last_node_index = self.CFG_node_index[last_node_id]
         method_nodes = self.CFG_node_ids[start_node_index: last_node_index + 1]
         return method_nodes
 
@@ -5,18 +5,8 @@ from ..CFG.CFG_driver import CFGDriver
 from ...utils import postprocessor, preprocessor
 
 
-def preprocessed_to_original_line_number_mapping(original, lang="java"):
-
-    p_to_o = {}
-    o_to_p = {}
-    idx = 0
-    for i, line in enumerate(original.split("\n")):
-        is_comment = preprocessor.is_comment(lang, line)
-        if not is_comment:
-            idx += 1
-            o_to_p[i + 1] = idx
-            p_to_o[idx] = i + 1
-    return p_to_o, o_to_p
+def preprocessed_to_original_line_number_mapping(original, lang="java") -> preprocessor.LineMap:
+    return preprocessor.strip_comments(lang, original)[1]
 
 
 def preprocessed_line_number_and_node_id_mapping(node_list):
@@ -41,21 +31,23 @@ def preprocessed_line_number_and_node_id_mapping(node_list):
     return line_to_id, id_to_line
 
 
-def line_number_to_node_id_mapping(src_code, node_list):
-    processed_to_original_mapping, original_to_processed_mapping = \
-        preprocessed_to_original_line_number_mapping(src_code)
+def line_number_to_node_id_mapping(src_code, node_list, line_map=None):
+    """
+    :param line_map: the line map of the preprocessing of the source code, e.g. `CFGDriver.line_map`,
+    the source code is preprocessed again when it is not given
+    """
+    line_map = line_map or preprocessed_to_original_line_number_mapping(src_code)
 
     processed_line_to_id, id_to_processed_line = preprocessed_line_number_and_node_id_mapping(node_list)
 
     # key: original_line_number, value: tuple (preprocessed_line_number, node_id)
-    line_number_to_node_id = {processed_to_original_mapping[k]: (k, v) for k, v in processed_line_to_id.items()
-                              if k in processed_to_original_mapping}
+    line_number_to_node_id = {line_map.to_original(k): (k, v) for k, v in processed_line_to_id.items()
+                              if line_map.to_original(k)}
 
     # key: node_id, value: list of [original lines]
     node_id_to_line_number = {}
     for node_id, lines in id_to_processed_line.items():
-        original_lines = [processed_to_original_mapping[line] for line in lines if
-                          line in processed_to_original_mapping]
+        original_lines = [line_map.to_original(line) for line in lines if line_map.to_original(line)]
         if original_lines:
             node_id_to_line_number[node_id] = original_lines
 
@@ -68,12 +60,14 @@ class CombinedDriver:
             src_language="java",
             src_code="",
             output_file="output.json",
+            driver=None,
     ):
         self.src_language = src_language
         self.src_code = src_code
         self.graph = nx.MultiDiGraph()
 
-        self.driver = CFGDriver(
+        # reuse an existing CFG driver of the same source code
+        self.driver = driver or CFGDriver(
             self.src_language, self.src_code
         )
 
@@ -90,7 +84,7 @@ class CombinedDriver:
         self.preprocessed_src_code = self.driver.src_code
 
         self.line_number_to_node_id, self.node_id_to_line_number = \
-            line_number_to_node_id_mapping(self.src_code, self.node_list)
+            line_number_to_node_id_mapping(self.src_code, self.node_list, self.driver.line_map)
 
         self.testable_methods_statistics = self.driver.testable_methods
 
@@ -1,7 +1,6 @@
 import subprocess
 
-from .. import get_language_map
-from tree_sitter import Parser
+from .language_registry import registry
 
 
 def get_commit_hash(directory):
@@ -25,7 +24,6 @@ class CustomParser:
         self.src_language = src_language
         self.src_code = src_code
         self.index = {}
-        self.language_map = get_language_map()
         self.root_node, self.tree = self.parse()
         self.all_tokens = []  # list of all tokens in the source code
         self.label = {}  # label for each node in the AST
@@ -56,9 +54,8 @@ class CustomParser:
             return
 
     def parse(self):
-        parser = Parser()  # tree-sitter parser
-        parser.set_language(self.language_map[self.src_language])
-        tree = parser.parse(bytes(self.src_code, "utf8"))
+        # the tree-sitter parser of the language is shared by the parsers of the thread
+        tree = registry.parse(self.src_language, self.src_code)
         self.root_node = tree.root_node
         # First few id values are reserved for special nodes such as start and end node
         self.create_AST_id(self.root_node, self.index, [5])
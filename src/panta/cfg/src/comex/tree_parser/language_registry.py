@@ -0,0 +1,70 @@
+import threading
+import time
+
+from .. import get_language_map
+
+
+class LanguageRegistry:
+    """
+    Process-wide pool of the tree-sitter languages and parsers.
+    The languages are loaded once from the shared library, the parsers are reused and kept per thread,
+    since a tree-sitter parser must not be used by two threads at the same time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._languages = {}
+        self.parsers_created = 0
+        self.parse_count = 0
+        self.parse_time = 0.0
+
+    def language(self, src_language):
+        language = self._languages.get(src_language)
+        if language is None:
+            with self._lock:
+                if src_language not in self._languages:
+                    self._languages[src_language] = get_language_map()[src_language]
+                language = self._languages[src_language]
+        return language
+
+    def parser(self, src_language):
+        """
+        :return: the tree-sitter parser of the language for the current thread
+        """
+        parsers = getattr(self._local, "parsers", None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        parser = parsers.get(src_language)
+        if parser is None:
+            from tree_sitter import Parser
+            parser = Parser()
+            parser.set_language(self.language(src_language))
+            parsers[src_language] = parser
+            with self._lock:
+                self.parsers_created += 1
+        return parser
+
+    def parse(self, src_language, src_code, old_tree=None):
+        """
+        :param src_code: str or the utf8 bytes of the source code
+        :param old_tree: the edited tree of the previous version of the source code, for an incremental parse
+        """
+        if isinstance(src_code, str):
+            src_code = bytes(src_code, "utf8")
+        time_start = time.perf_counter()
+        parser = self.parser(src_language)
+        tree = parser.parse(src_code, old_tree) if old_tree is not None else parser.parse(src_code)
+        duration = time.perf_counter() - time_start
+        with self._lock:
+            self.parse_count += 1
+            self.parse_time += duration
+        return tree
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"languages": sorted(self._languages), "parsers_created": self.parsers_created,
+                    "parse_count": self.parse_count, "parse_time": round(self.parse_time, 6)}
+
+
+registry = LanguageRegistry()
@@ -5,9 +5,13 @@ from ..utils import preprocessor
 
 def pre_process_src_code(src_language, src_code):
     """Pre-process the source code"""
+    return pre_process_src_code_and_line_map(src_language, src_code)[0]
+
+
+def pre_process_src_code_and_line_map(src_language, src_code):
+    """Pre-process the source code, and map its lines to the lines of the original source code"""
     src_code = preprocessor.remove_empty_lines(src_code)
-    src_code = preprocessor.remove_comments(src_language, src_code)
-    return src_code
+    return preprocessor.strip_comments(src_language, src_code)
 
 
 class ParserDriver:
@@ -16,7 +20,7 @@ class ParserDriver:
     def __init__(self, src_language, src_code):
         """Initialize the driver. Preprocess the code before parsing"""
         self.src_language = src_language
-        self.src_code = pre_process_src_code(src_language, src_code)
+        self.src_code, self.line_map = pre_process_src_code_and_line_map(src_language, src_code)
 
         self.parser_map = {
             "java": JavaParser,
@@ -25,7 +29,8 @@ class ParserDriver:
             # Add more languages here
         }
         self.parser = self.parser_map[self.src_language](self.src_language, self.src_code)
-        self.root_node, self.tree = self.parser.parse()
+        # the source code is parsed once, by the constructor of the parser
+        self.root_node, self.tree = self.parser.root_node, self.parser.tree
         (
             self.all_tokens,
             self.label,
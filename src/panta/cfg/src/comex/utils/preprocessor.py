@@ -2,8 +2,32 @@
 
 import re
 import tokenize
+from array import array
 from io import StringIO
 
+# comments and the string/char literals, which may contain comment delimiters, of the C-like languages
+COMMENT_PATTERN = re.compile(
+    r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
+    re.DOTALL | re.MULTILINE,
+)
+
+
+class LineMap:
+    """
+    Line numbers (1-based) of the source code without comments and of the original source code.
+    A line without counterpart, e.g. an original line which only contains a comment, maps to 0.
+    """
+
+    def __init__(self, p_to_o: array, o_to_p: array):
+        self.p_to_o = p_to_o
+        self.o_to_p = o_to_p
+
+    def to_original(self, line: int) -> int:
+        return self.p_to_o[line] if 0 < line < len(self.p_to_o) else 0
+
+    def to_processed(self, line: int) -> int:
+        return self.o_to_p[line] if 0 < line < len(self.o_to_p) else 0
+
 
 def remove_empty_lines(source):
     temp = []
@@ -56,24 +80,86 @@ def remove_comments(lang, source):
     elif lang in ["ruby"]:
         return source
     else:
+        return strip_comments(lang, source)[0]
 
-        def replacer(match):
-            s = match.group(0)
-            if s.startswith("/"):
-                return "*"  # note: a placeholder and not an empty string
-            else:
-                return s
 
-        pattern = re.compile(
-            r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
-            re.DOTALL | re.MULTILINE,
-        )
-        temp = []
-        for x in re.sub(pattern, replacer, source).split("\n"):
-            if x.strip() != "*":  # remove lines prior to be comments
-                temp.append(x.strip("*"))
-            # else:
-        return "\n".join(temp)
+def strip_comments(lang, source):
+    """
+    Remove the comments of the C-like languages in a single pass over the tokens, and record for each line
+    of the result the original line of its first code token.
+    A comment is replaced by a "*" placeholder, the lines left with the placeholder only are removed.
+    :return: tuple (source without comments, LineMap)
+    """
+    if lang in ["python", "ruby"]:
+        return remove_comments(lang, source), comment_prefix_line_map(lang, source)
+
+    chunks = []
+    # line of the result -> [newlines of its multi-line comments, newlines of the comments before its first code]
+    merged = {}
+    line_index, line_has_code, pending = 0, False, 0
+
+    def code_chunk(code):
+        nonlocal line_index, line_has_code, pending
+        first, newline, rest = code.partition("\n")
+        if not line_has_code and first.strip():
+            line_has_code = True
+            if pending:
+                merged[line_index][1] = pending
+        if newline:
+            line_index += 1 + rest.count("\n")
+            line_has_code, pending = bool(rest[rest.rfind("\n") + 1:].strip()), 0
+        chunks.append(code)
+
+    position = 0
+    for match in COMMENT_PATTERN.finditer(source):
+        code_chunk(source[position:match.start()])
+        token = match.group(0)
+        if token.startswith("/"):
+            # note: a placeholder and not an empty string
+            chunks.append("*")
+            newlines = token.count("\n")
+            if newlines:
+                merged.setdefault(line_index, [0, 0])[0] += newlines
+                if not line_has_code:
+                    pending += newlines
+        else:
+            code_chunk(token)
+        position = match.end()
+    code_chunk(source[position:])
+
+    temp = []
+    p_to_o = array("i", [0])
+    o_to_p = array("i", [0] * (source.count("\n") + 2))
+    original_line = 0
+    for index, line in enumerate("".join(chunks).split("\n")):
+        original_line += 1
+        if index in merged:
+            newlines, before_code = merged[index]
+            if line.strip() != "*":
+                temp.append(line.strip("*"))
+                p_to_o.append(original_line + before_code)
+                o_to_p[original_line:original_line + newlines + 1] = array("i", [len(temp)] * (newlines + 1))
+            original_line += newlines
+        elif line.strip() != "*":  # remove lines prior to be comments
+            temp.append(line.strip("*"))
+            p_to_o.append(original_line)
+            o_to_p[original_line] = len(temp)
+    return "\n".join(temp), LineMap(p_to_o, o_to_p)
+
+
+def comment_prefix_line_map(lang, source):
+    """
+    line map of the languages without a comment tokenizer, the lines starting with a comment are removed
+    """
+    p_to_o = array("i", [0])
+    o_to_p = array("i", [0])
+    for line in source.split("\n"):
+        if is_comment(lang, line):
+            o_to_p.append(0)
+        else:
+            p_to_o.append(len(o_to_p))
+            o_to_p.append(len(p_to_o) - 1)
+    return LineMap(p_to_o, o_to_p)
 
 
 def remove_inline_comment(lang, line):
@@ -1,4 +1,5 @@
-from ..tree_parser.parser_driver import ParserDriver
+from ..tree_parser.language_registry import registry
+from ..tree_parser.parser_driver import pre_process_src_code
 from .cs_nodes import statement_types as cs_statement_types
 from .java_nodes import statement_types as java_statement_types
 
@@ -31,7 +32,8 @@ def traverse_tree(tree, finest_granularity=None):
 def pre_process_src(extension, line, wrap_class=False, ignore_error=False):
     if wrap_class:
         line = "public class test {" + line + "}"
-    parsed = ParserDriver(extension, line)
+    # only the tree of the snippet is needed, not the tokens and symbol table of a ParserDriver
+    tree = registry.parse(extension, pre_process_src_code(extension, line))
     # new_line_pos = set()
     fixed = ""
     if extension == "java":
@@ -39,7 +41,7 @@ def pre_process_src(extension, line, wrap_class=False, ignore_error=False):
     else:
         statement_types = cs_statement_types
     if not ignore_error:
-        if parsed.parser.root_node.has_error:
+        if tree.root_node.has_error:
             return None
         # for tag in parsed.parser.index:
         #     if tag[2] == "ERROR":
@@ -50,7 +52,7 @@ def pre_process_src(extension, line, wrap_class=False, ignore_error=False):
     #     fixed = fixed + char
     #     if pos in new_line_pos:
     #         fixed = fixed + "\n"
-    for node in traverse_tree(parsed.tree):
+    for node in traverse_tree(tree):
         # ? keeping on node.children check causes literals to be dropped case 7129
         if node.type in statement_types["node_list_type"]:
             fixed = fixed + "\n"
@@ -0,0 +1,104 @@
+"""
+Persistent store of the control flow analysis of source files, for the analyses which go over the same
+files again and again (evaluation statistics, repeated runs on the Defects4J subjects).
+An artifact holds the file object, the testable methods statistics, the line mappings and, for each method
+under test, its subgraph and basis paths as integer arrays, so loading it needs neither tree-sitter nor networkx.
+The artifacts are keyed by the hash of the source code and stored under a directory per comex version.
+"""
+import hashlib
+import json
+import os
+import pickle
+from array import array
+
+from .cfg.src.comex import __version__ as COMEX_VERSION
+from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver, find_paths
+from .cfg.src.comex.codeviews.combined_graph.combined_driver import line_number_to_node_id_mapping
+from .panta_logger import pantaLogger
+
+# bump when the content of the artifacts changes
+ARTIFACT_FORMAT_VERSION = 2
+
+logger = pantaLogger.initialize_logger(__name__)
+
+
+def artifact_key(language, src_code, properties=None):
+    # only the names of the properties change the analysis
+    content = json.dumps([language, sorted((properties or {}).keys()), src_code])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def method_artifact(cfg_driver: CFGDriver, method) -> dict:
+    """
+    :param method: tuple (start_id, last_node_id, method_graph, method_name, cyc_complexity, clz_name)
+    :return: the method subgraph as the node ids and the flattened (source, target) pairs of the edges,
+    and its basis paths
+    """
+    start_id, last_node_id, method_graph, method_name, cyc_complexity, clz_name = method
+    nodes, edges, paths = array("i"), array("i"), []
+    if method_graph is not None:
+        nodes.extend(method_graph.nodes())
+        for source, target in method_graph.edges():
+            edges.append(source)
+            edges.append(target)
+        paths = [array("i", path) for path in find_paths(method_graph, start_id, target=cfg_driver.dummy_exit)]
+    return {"start_id": start_id, "last_id": last_node_id, "name": method_name, "class": clz_name,
+            "complexity": cyc_complexity, "nodes": nodes, "edges": edges, "paths": paths}
+
+
+def build_artifacts(cfg_driver: CFGDriver) -> dict:
+    line_number_to_node_id, node_id_to_line_number = line_number_to_node_id_mapping(
+        cfg_driver.src_code, cfg_driver.CFG_nodes, cfg_driver.line_map)
+    return {
+        "file_obj": cfg_driver.file_obj,
+        "testable_methods": cfg_driver.testable_methods,
+        "line_number_to_node_id": line_number_to_node_id,
+        "node_id_to_line_number": node_id_to_line_number,
+        "methods": [method_artifact(cfg_driver, method) for method in cfg_driver.methods_under_test],
+    }
+
+
+class ArtifactStore:
+    """
+    On-disk store of the CFG artifacts, one pickle per source file version:
+    `<root_dir>/comex-<version>-<format version>/<hash[:2]>/<hash>.pkl`
+    """
+
+    def __init__(self, root_dir: str):
+        self.store_dir = os.path.join(root_dir, f"comex-{COMEX_VERSION}-{ARTIFACT_FORMAT_VERSION}")
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.store_dir, key[:2], f"{key}.pkl")
+
+    def load(self, key):
+        artifact_file = self.path(key)
+        if not os.path.isfile(artifact_file):
+            return None
+        try:
+            with open(artifact_file, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load the CFG artifacts {artifact_file}: {e}")
+            return None
+
+    def save(self, key, artifacts):
+        artifact_file = self.path(key)
+        os.makedirs(os.path.dirname(artifact_file), exist_ok=True)
+        try:
+            with open(f"{artifact_file}.{os.getpid()}.tmp", "wb") as f:
+                pickle.dump(artifacts, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{artifact_file}.{os.getpid()}.tmp", artifact_file)
+        except Exception as e:
+            logger.warning(f"Failed to store the CFG artifacts to {artifact_file}: {e}")
+
+    def get(self, language, src_code, properties=None) -> dict:
+        """
+        load the artifacts of the source code, the CFG is built and stored on a miss
+        """
+        key = artifact_key(language, src_code, properties)
+        artifacts = self.load(key)
+        if artifacts is None:
+            artifacts = build_artifacts(CFGDriver(language, src_code, properties or {}))
+            self.save(key, artifacts)
+        return artifacts
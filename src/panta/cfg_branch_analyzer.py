@@ -2,9 +2,9 @@
 CFG Branch Analyzer - Specialized for analyzing branch information in control flow graphs to improve branch coverage
 """
 import networkx as nx
+from collections import deque
 from typing import Dict, List, Tuple, Set, Optional
-from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
-from .cfg.src.comex.codeviews.combined_graph.combined_driver import line_number_to_node_id_mapping
+from . import cfg_cache
 from .utils import read_file
 from .panta_logger import pantaLogger
 
@@ -21,22 +21,32 @@ class CFGBranchAnalyzer:
         self.logger = pantaLogger.initialize_logger(__name__)
         
         # Initialize CFG driver
-        self.cfg_driver = CFGDriver(language, source_code)
+        self.cfg_driver = cfg_cache.get_cfg_driver(language, source_code)
         self.graph = self.cfg_driver.graph
         self.cfg_nodes = self.cfg_driver.CFG_nodes
         self.cfg_node_map = self.cfg_driver.CFG_node_map
         self.cfg_edge_map = self.cfg_driver.CFG_edge_map
         
         # Get line number mapping
-        _, self.node_id_to_line_number = line_number_to_node_id_mapping(
-            source_code, self.cfg_nodes
-        )
+        _, self.node_id_to_line_number = cfg_cache.get_line_mapping(language, source_code)
         
+        # Outgoing edges of each node as (target, edge label), built once for all the lookups
+        self.out_edges = {}
+        for source_node, target_node in self.graph.edges():
+            self.out_edges.setdefault(source_node, []).append(
+                (target_node, self.cfg_edge_map.get((source_node, target_node))))
+
         # Analyze branch information
         self.branch_info = self._analyze_branches()
         self.conditional_branches = self._extract_conditional_branches()
         self.loop_branches = self._extract_loop_branches()
         self.exception_branches = self._extract_exception_branches()
+
+        # First conditional branch of each line
+        self.line_to_branch = {}
+        for branch in self.conditional_branches:
+            for line in branch['lines']:
+                self.line_to_branch.setdefault(line, branch)
     
     def _analyze_branches(self) -> Dict:
         """
@@ -146,13 +156,8 @@ class CFGBranchAnalyzer:
         """
         Calculate branch complexity
         """
-        complexity = 0
-        for edge in self.graph.edges():
-            if edge[0] == node_id:
-                edge_label = self.cfg_edge_map.get(edge)
-                if edge_label in ['pos_next', 'neg_next']:
-                    complexity += 1
-        return complexity
+        return sum(1 for _, edge_label in self.out_edges.get(node_id, [])
+                   if edge_label in ['pos_next', 'neg_next'])
     
     def get_branch_coverage_hints(self, missed_branches: List[int]) -> List[Dict]:
         """
@@ -162,17 +167,16 @@ class CFGBranchAnalyzer:
         
         for branch_line in missed_branches:
             # Find branch nodes containing this line
-            for branch in self.conditional_branches:
-                if branch_line in branch['lines']:
-                    hint = {
-                        'branch_line': branch_line,
-                        'statement': branch['statement'],
-                        'suggested_test_conditions': self._generate_test_conditions(branch),
-                        'branch_type': branch['edge_label'],
-                        'complexity': branch['complexity']
-                    }
-                    hints.append(hint)
-                    break
+            branch = self.line_to_branch.get(branch_line)
+            if branch:
+                hint = {
+                    'branch_line': branch_line,
+                    'statement': branch['statement'],
+                    'suggested_test_conditions': self._generate_test_conditions(branch),
+                    'branch_type': branch['edge_label'],
+                    'complexity': branch['complexity']
+                }
+                hints.append(hint)
         
         return hints
     
@@ -248,18 +252,17 @@ class CFGBranchAnalyzer:
         """
         # This needs to be implemented according to the actual CFG structure
         # Simplified implementation, returns all reachable nodes from start_node
-        visited = set()
-        queue = [start_node]
+        visited = {start_node}
+        queue = deque([start_node])
         method_nodes = []
         
         while queue:
-            node = queue.pop(0)
-            if node not in visited:
-                visited.add(node)
-                method_nodes.append(node)
-                for successor in self.graph.successors(node):
-                    if successor not in visited:
-                        queue.append(successor)
+            node = queue.popleft()
+            method_nodes.append(node)
+            for successor, _ in self.out_edges.get(node, []):
+                if successor not in visited:
+                    visited.add(successor)
+                    queue.append(successor)
         
         return method_nodes
     
@@ -269,19 +272,15 @@ class CFGBranchAnalyzer:
         """
         branches = []
         
-        for edge in self.graph.edges():
-            if edge[0] == node_id:
-                edge_label = self.cfg_edge_map.get(edge)
-                target_node = edge[1]
-                
-                branch_info = {
-                    'source': node_id,
-                    'target': target_node,
-                    'edge_label': edge_label,
-                    'lines': self.node_id_to_line_number.get(node_id, []),
-                    'type': self._get_branch_type(edge_label)
-                }
-                branches.append(branch_info)
+        for target_node, edge_label in self.out_edges.get(node_id, []):
+            branch_info = {
+                'source': node_id,
+                'target': target_node,
+                'edge_label': edge_label,
+                'lines': self.node_id_to_line_number.get(node_id, []),
+                'type': self._get_branch_type(edge_label)
+            }
+            branches.append(branch_info)
         
         return branches
     
@@ -0,0 +1,115 @@
+"""
+Cache of the control flow graphs of the source files.
+The source file does not change during a run, so the tree-sitter parse, the CFG construction,
+the path enumeration and the line mapping only need to happen once per version of the file.
+The entries are keyed by the hash of the source code, kept in memory and optionally pickled to a directory.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from typing import TYPE_CHECKING
+
+from .panta_logger import pantaLogger
+
+# comex pulls tree-sitter and networkx, it is imported when the first CFG is built
+if TYPE_CHECKING:
+    from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
+    from .cfg.src.comex.codeviews.combined_graph.combined_driver import CombinedDriver
+
+# bump when the cached objects change, so the old pickles are not loaded
+CFG_CACHE_VERSION = 4
+
+_memory_cache = {}
+_lock = threading.Lock()
+_cache_dir = None
+logger = pantaLogger.initialize_logger(__name__)
+
+
+def set_cache_dir(cache_dir):
+    """
+    enable the on-disk cache, an empty value keeps the cache in memory only
+    """
+    global _cache_dir
+    _cache_dir = cache_dir or None
+    if _cache_dir:
+        os.makedirs(_cache_dir, exist_ok=True)
+
+
+def cache_key(kind, language, src_code, properties=None):
+    content = json.dumps([CFG_CACHE_VERSION, kind, language, properties or {}, src_code], sort_keys=True)
+    return f"{kind}-{hashlib.sha256(content.encode()).hexdigest()}"
+
+
+def get_or_create(key, create, persist=True):
+    with _lock:
+        if key in _memory_cache:
+            return _memory_cache[key]
+
+    value = None
+    cache_file = os.path.join(_cache_dir, f"{key}.pkl") if _cache_dir and persist else None
+    if cache_file and os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                value = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load the cached CFG {cache_file}: {e}")
+    if value is None:
+        value = create()
+        if cache_file:
+            try:
+                with open(f"{cache_file}.{os.getpid()}.tmp", "wb") as f:
+                    pickle.dump(value, f)
+                os.replace(f"{cache_file}.{os.getpid()}.tmp", cache_file)
+            except Exception as e:
+                logger.warning(f"Failed to cache the CFG to {cache_file}: {e}")
+
+    with _lock:
+        return _memory_cache.setdefault(key, value)
+
+
+def get_cfg_driver(language, src_code, properties=None) -> "CFGDriver":
+    from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
+    return get_or_create(cache_key("cfg", language, src_code, properties),
+                         lambda: CFGDriver(language, src_code, properties or {}))
+
+
+def get_line_mapping(language, src_code, properties=None):
+    """
+    :return: tuple (line_number_to_node_id, node_id_to_line_number) of the CFG nodes
+    """
+    from .cfg.src.comex.codeviews.combined_graph.combined_driver import line_number_to_node_id_mapping
+
+    def create():
+        cfg_driver = get_cfg_driver(language, src_code, properties)
+        return line_number_to_node_id_mapping(src_code, cfg_driver.CFG_nodes, cfg_driver.line_map)
+    return get_or_create(cache_key("lines", language, src_code, properties), create)
+
+
+def get_combined_driver(language, src_code) -> "CombinedDriver":
+    from .cfg.src.comex.codeviews.combined_graph.combined_driver import CombinedDriver
+    return get_or_create(cache_key("combined", language, src_code),
+                         lambda: CombinedDriver(src_language=language, src_code=src_code,
+                                                driver=get_cfg_driver(language, src_code)),
+                         persist=False)
+
+
+def get_branch_analyzer(language, src_code):
+    from .cfg_branch_analyzer import CFGBranchAnalyzer
+    return get_or_create(cache_key("branches", language, src_code),
+                         lambda: CFGBranchAnalyzer(language, src_code), persist=False)
+
+
+def get_context_slicer(language, src_code):
+    from .context_slicer import ContextSlicer
+
+    def create():
+        combined_driver = get_combined_driver(language, src_code)
+        return ContextSlicer(language, src_code, combined_driver.driver, combined_driver.node_id_to_line_number)
+    return get_or_create(cache_key("slicer", language, src_code), create, persist=False)
+
+
+def clear():
+    with _lock:
+        _memory_cache.clear()
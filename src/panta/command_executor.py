@@ -1,8 +1,38 @@
+import atexit
+import contextlib
+import re
+import shutil
 import subprocess
 import time
 import os
 import signal
 
+from .panta_logger import pantaLogger
+
+# directory of the process groups of the running commands, set by a parent which has to kill them with its job,
+# the commands run in their own sessions so they are not in the process group of the job
+PROCESS_GROUPS_ENV_VAR = "PANTA_PROCESS_GROUPS_DIR"
+
+
+@contextlib.contextmanager
+def popen_in_new_session(command, **kwargs):
+    """
+    start the command in its own session, so that all its processes are killed on timeout, and record its
+    process group in `PANTA_PROCESS_GROUPS_DIR` while it runs
+    """
+    p = subprocess.Popen(command, start_new_session=True, **kwargs)
+    process_groups_dir = os.environ.get(PROCESS_GROUPS_ENV_VAR)
+    record = os.path.join(process_groups_dir, str(p.pid)) if process_groups_dir else None
+    if record:
+        open(record, "w").close()
+    try:
+        yield p
+    finally:
+        if record:
+            with contextlib.suppress(OSError):
+                os.remove(record)
+
+
 class CommandExecutor:
     @staticmethod
     def run_command(command, cwd=None, timeout=60):
@@ -11,18 +41,61 @@ class CommandExecutor:
             tuple: A tuple containing the standard output ('stdout'), standard error ('stderr'),
             exit code ('exit_code'), and the time of the executed command ('command_start_time').
         """
-        p = None
-        try:
-            command_start_time = int(round(time.time() * 1000))
-            p = subprocess.Popen(command, shell=True, cwd=cwd, text=True,
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
-            stdout, stderr = p.communicate(timeout=timeout)
-            exit_code = p.returncode
-            command_duration = int(round(time.time() * 1000)) - command_start_time
-            return stdout, stderr, exit_code, command_start_time, command_duration
-        except subprocess.TimeoutExpired:
-            print(f'Timeout for {command} ({timeout}s) expired')
-            print('Terminating the whole process group...')
-            if p:
+        command_start_time = int(round(time.time() * 1000))
+        with popen_in_new_session(command, shell=True, cwd=cwd, text=True,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE) as p:
+            try:
+                stdout, stderr = p.communicate(timeout=timeout)
+                exit_code = p.returncode
+                command_duration = int(round(time.time() * 1000)) - command_start_time
+                return stdout, stderr, exit_code, command_start_time, command_duration
+            except subprocess.TimeoutExpired:
+                print(f'Timeout for {command} ({timeout}s) expired')
+                print('Terminating the whole process group...')
                 os.killpg(os.getpgid(p.pid), signal.SIGTERM)
-            return "Timeout", None, -1, None, None
\ No newline at end of file
+                return "Timeout", None, -1, None, None
+
+
+class MvndCommandExecutor:
+    """
+    Run the maven commands on the Maven daemon (mvnd), the daemon keeps the JVM, the loaded plugins
+    and the project model warm between the builds, so only the first build pays the maven startup.
+    Commands without `mvn` are run as they are.
+    """
+    MAVEN_COMMAND_PATTERN = re.compile(r'(^|[;&|(]\s*)mvn(?=\s|$)')
+
+    def __init__(self, mvnd_command="mvnd"):
+        self.mvnd_command = mvnd_command
+        self.logger = pantaLogger.initialize_logger(__name__)
+        self.available = shutil.which(mvnd_command) is not None
+        if self.available:
+            atexit.register(self.stop)
+        else:
+            self.logger.warning(f"{mvnd_command} not found, the maven commands are run with mvn.")
+
+    def rewrite_command(self, command):
+        if not self.available:
+            return command
+        # keep the plain maven console output, the error message parsers rely on it
+        return self.MAVEN_COMMAND_PATTERN.sub(rf"\g<1>{self.mvnd_command} -Dmvnd.rawStreams=true", command)
+
+    def run_command(self, command, cwd=None, timeout=60):
+        return CommandExecutor.run_command(self.rewrite_command(command), cwd=cwd, timeout=timeout)
+
+    def stop(self):
+        subprocess.run([self.mvnd_command, "--stop"], capture_output=True)
+
+
+EXECUTOR_BACKENDS = {"subprocess": CommandExecutor, "mvnd": MvndCommandExecutor}
+_executors = {}
+
+
+def get_command_executor(backend="subprocess"):
+    """
+    the executor is shared in the process, so all the builds of a project reuse the same daemon
+    """
+    if backend not in EXECUTOR_BACKENDS:
+        raise ValueError(f"Unsupported executor backend: {backend}")
+    if backend not in _executors:
+        _executors[backend] = EXECUTOR_BACKENDS[backend]()
+    return _executors[backend]
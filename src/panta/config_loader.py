@@ -1,6 +1,5 @@
 import sys
 from os.path import dirname, abspath, join, exists
-from dynaconf import Dynaconf
 
 SETTINGS_FILES = [
     "language_extensions.toml",
@@ -41,6 +40,7 @@ class SingletonSettings:
                 if not exists(file_path):
                     raise FileNotFoundError(f"Settings file not found: {file_path}")
 
+            from dynaconf import Dynaconf
             self.settings = Dynaconf(
                 envvar_prefix=False, merge_enabled=True, settings_files=settings_files
             )
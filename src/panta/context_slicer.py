@@ -0,0 +1,115 @@
+"""
+Slice of the class under test needed to test one of its methods: the method, the methods of the class it calls
+transitively, the fields they reference and the constructors which instantiate the class.
+The calls, fields and constructors are read from the control flow graph, the line ranges of the members from
+the tree-sitter outline of the source file.
+"""
+import re
+from collections import deque
+from typing import TYPE_CHECKING
+
+from .source_outline import get_source_outline
+
+if TYPE_CHECKING:
+    from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][\w$]*")
+STATIC_PATTERN = re.compile(r"\bstatic\b")
+
+
+class ContextSlice:
+    def __init__(self, focal, callees: list, fields: list, constructors: list):
+        """
+        :param focal: member of the method under test, None when it is not in the outline
+        """
+        self.focal = focal
+        self.callees = callees
+        self.fields = fields
+        self.constructors = constructors
+
+    def context_members(self) -> list:
+        """
+        :return: the fields, constructors and callees, in the order of the source file
+        """
+        return sorted(self.fields + self.constructors + self.callees, key=lambda member: member.start)
+
+    def lines(self) -> list:
+        members = self.context_members() + ([self.focal] if self.focal else [])
+        return sorted({line for member in members for line in member.lines()})
+
+
+class ContextSlicer:
+    def __init__(self, language: str, source_code: str, cfg_driver: "CFGDriver", node_id_to_line: dict):
+        self.driver = cfg_driver
+        self.node_to_line = node_id_to_line
+        self.outline = get_source_outline(language, source_code)
+        self.source_lines = source_code.split("\n")
+
+        # there may be multiple classes defined in the file, we focus on the outer class for now
+        clz_obj = cfg_driver.file_obj["class_objects"][0]
+        self.fields = self.unique_members(field["id"] for field in clz_obj["fields"])
+        # the private constructors cannot instantiate the class from a test
+        self.constructors = self.unique_members(constructor["id"] for constructor in clz_obj["constructors"]
+                                                if not constructor["value"].strip().startswith("private"))
+        # transitive callees of each method declaration
+        self._callees = {}
+
+    def member_of(self, node_id):
+        lines = self.node_to_line.get(node_id)
+        return self.outline.member_at(lines[0] - 1) if lines else None
+
+    def unique_members(self, node_ids) -> list:
+        members = []
+        for node_id in node_ids:
+            member = self.member_of(node_id)
+            if member and member not in members:
+                members.append(member)
+        return members
+
+    def called_methods(self, decl_id: int) -> list:
+        """
+        :return: declaration ids of the class methods called by the method, all the overloads of a called name
+        """
+        # the calls are "call, declaration id, next declaration id", as the method_calls_within_class of the paths
+        return [int(method_call.rsplit(",", 2)[1]) for node_id in self.driver.get_method_nodes(decl_id)
+                for method_call in self.driver.get_inside_calls(node_id)]
+
+    def transitive_callees(self, decl_id: int) -> list:
+        """
+        :return: declaration ids of the class methods called directly or indirectly by the method, breadth first
+        """
+        callees = self._callees.get(decl_id)
+        if callees is None:
+            visited = {decl_id}
+            callees = []
+            queue = deque([decl_id])
+            while queue:
+                for callee in self.called_methods(queue.popleft()):
+                    if callee not in visited and callee in self.driver.return_statement_map:
+                        visited.add(callee)
+                        callees.append(callee)
+                        queue.append(callee)
+            self._callees[decl_id] = callees
+        return callees
+
+    def slice(self, decl_id: int) -> ContextSlice:
+        """
+        :param decl_id: node id of the declaration of the method under test
+        """
+        focal = self.member_of(decl_id)
+        callee_ids = self.transitive_callees(decl_id)
+        callees = [member for member in self.unique_members(callee_ids) if member is not focal]
+
+        identifiers = set()
+        for method_id in [decl_id] + callee_ids:
+            for node_id in self.driver.get_method_nodes(method_id):
+                identifiers.update(IDENTIFIER_PATTERN.findall(self.driver.CFG_node_map[node_id][0]))
+        fields = [field for field in self.fields if identifiers.intersection(field.names)]
+
+        # a static method is called without an instance of the class
+        declaration = self.driver.CFG_node_map[decl_id][0].split("(")[0]
+        constructors = [] if STATIC_PATTERN.search(declaration) else list(self.constructors)
+        return ContextSlice(focal, callees, fields, constructors)
+
+    def member_source(self, member) -> str:
+        return "\n".join(self.source_lines[member.start:member.end + 1])
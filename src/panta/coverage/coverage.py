@@ -9,7 +9,7 @@ from ..panta_logger import pantaLogger
 
 
 class Coverage(ABC):
-    def __init__(self, file_path: str, src_file_path: str, coverage_type: Literal["pycov", "jacoco"]):
+    def __init__(self, file_path: str, src_file_path: str, coverage_type: Literal["pycov", "jacoco", "jacoco_exec"]):
         self.file_path = file_path
         self.src_file_path = src_file_path
         self.coverage_type = coverage_type
@@ -57,3 +57,10 @@ class Coverage(ABC):
     @abstractmethod
     def parse_coverage_report(self) -> Tuple[list, list, float, float]:
         pass
+
+    def parse_covered_bitsets(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: bitsets of the covered lines and the covered branches
+        """
+        raise NotImplementedError(f"Coverage bitsets are not supported for {self.coverage_type}")
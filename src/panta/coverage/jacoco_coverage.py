@@ -3,7 +3,7 @@ import re
 import os
 from typing import Tuple
 from .coverage import Coverage
-from .jacoco_parser import parse_missed_line_branch_locations
+from .jacoco_parser import parse_missed_line_branch_locations, iter_line_counters, covered_bitsets
 
 
 def get_class_name(file_path):
@@ -35,8 +35,8 @@ class JacocoCoverage(Coverage):
         package_name, class_name = self.extract_package_and_class_java()
         coverage_info = parse_missed_line_branch_locations(self.project_dir, package_name, class_name)
 
-        lines_missed = coverage_info["lines_not_covered"] + coverage_info["lines_partially_covered"]
-        branches_missed = coverage_info["branch_not_covered"] + coverage_info["branch_partially_covered"]
+        lines_missed = (coverage_info["lines_not_covered"] + coverage_info["lines_partially_covered"]).tolist()
+        branches_missed = (coverage_info["branch_not_covered"] + coverage_info["branch_partially_covered"]).tolist()
 
         missed_lines, covered_lines, missed_branches, covered_branches = self.parse_missed_covered_jacoco(package_name,
                                                                                                           class_name)
@@ -48,6 +48,10 @@ class JacocoCoverage(Coverage):
         branch_coverage_percentage = (float(covered_branches) / total_branches) if total_branches > 0 else 0
         return lines_missed, branches_missed, line_coverage_percentage, branch_coverage_percentage
 
+    def parse_covered_bitsets(self) -> Tuple[int, int]:
+        package_name, class_name = self.extract_package_and_class_java()
+        return covered_bitsets(sorted(iter_line_counters(self.project_dir, package_name, class_name)))
+
     def parse_missed_covered_jacoco(self, package_name: str, class_name: str) -> tuple[int, int, int, int]:
         with open(self.file_path, 'r') as file:
             reader = csv.DictReader(file)
@@ -0,0 +1,492 @@
+import functools
+import glob
+import json
+import os
+import re
+import struct
+import subprocess
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Tuple
+
+from .jacoco_coverage import JacocoCoverage
+from .jacoco_parser import covered_bitsets, iter_line_counters
+from ..command_executor import CommandExecutor
+from ..incremental_validator import PANTA_CACHE_DIR
+from ..panta_logger import pantaLogger
+
+BLOCK_HEADER = 0x01
+BLOCK_SESSION_INFO = 0x10
+BLOCK_EXECUTION_DATA = 0x11
+EXEC_MAGIC_NUMBER = 0xC0C0
+JAVA_9_CLASS_VERSION = 53
+JAVA_8_CLASS_VERSION = 52
+
+
+def _crc64_table():
+    table = []
+    for i in range(256):
+        value = i
+        for _ in range(8):
+            value = (value >> 1) ^ 0xD800000000000000 if value & 1 else value >> 1
+        table.append(value)
+    return table
+
+
+CRC64_TABLE = _crc64_table()
+
+
+def crc64_update(checksum, data):
+    for byte in data:
+        checksum = (checksum >> 8) ^ CRC64_TABLE[(checksum ^ byte) & 0xFF]
+    return checksum
+
+
+def class_id(class_bytes: bytes) -> int:
+    """
+    the class id of JaCoCo (CRC64 of the class file), the execution data is recorded by this id
+    """
+    if len(class_bytes) > 7 and class_bytes[6] == 0 and class_bytes[7] == JAVA_9_CLASS_VERSION:
+        # JaCoCo computes the id of Java 9 class files as if they were Java 8 class files
+        checksum = crc64_update(0, class_bytes[:7])
+        checksum = crc64_update(checksum, [JAVA_8_CLASS_VERSION])
+        return crc64_update(checksum, class_bytes[8:])
+    return crc64_update(0, class_bytes)
+
+PROBE_MAPPER_CLASS_NAME = "PantaProbeMapper"
+# the probe mapper uses the core API of this version and later
+MIN_JACOCO_VERSION = (0, 8, 2)
+# report of the execution data, when the probes cannot be mapped with the JaCoCo version of the agent
+JACOCO_REPORT_COMMAND = "mvn -q jacoco:report -Djacoco.dataFile={data_file}"
+JACOCO_REPORT_XML = os.path.join("target", "site", "jacoco", "jacoco.xml")
+JACOCO_CORE_CLASSPATH_COMMAND = "mvn -q dependency:build-classpath -Dmdep.outputFile={output_file}"
+# project resolving the classpath of the JaCoCo core with its own asm dependencies
+JACOCO_CORE_POM = """<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>panta</groupId>
+  <artifactId>jacoco-core-classpath</artifactId>
+  <version>1</version>
+  <dependencies>
+    <dependency>
+      <groupId>org.jacoco</groupId>
+      <artifactId>org.jacoco.core</artifactId>
+      <version>{version}</version>
+    </dependency>
+  </dependencies>
+</project>
+"""
+
+# Analyze a class once with no probe hit, then once per probe with only that probe hit,
+# the output maps each probe to the lines (and branches) it covers
+PROBE_MAPPER = """
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import org.jacoco.core.analysis.Analyzer;
+import org.jacoco.core.analysis.CoverageBuilder;
+import org.jacoco.core.analysis.IClassCoverage;
+import org.jacoco.core.analysis.ILine;
+import org.jacoco.core.data.ExecutionData;
+import org.jacoco.core.data.ExecutionDataStore;
+import org.jacoco.core.internal.data.CRC64;
+import org.jacoco.core.internal.flow.ClassProbesAdapter;
+import org.jacoco.core.internal.flow.ClassProbesVisitor;
+import org.jacoco.core.internal.flow.MethodProbesVisitor;
+import org.jacoco.core.internal.instr.InstrSupport;
+
+public class PantaProbeMapper {
+    public static void main(String[] args) throws Exception {
+        for (int a = 0; a + 1 < args.length; a += 2) {
+            byte[] bytes = Files.readAllBytes(Paths.get(args[a]));
+            String name = args[a + 1];
+            int count = probeCount(bytes);
+            long id = CRC64.classId(bytes);
+            System.out.println("CLASS\\t" + Long.toHexString(id) + "\\t" + name);
+            report(bytes, name, id, new boolean[count], -1);
+            for (int i = 0; i < count; i++) {
+                boolean[] probes = new boolean[count];
+                probes[i] = true;
+                report(bytes, name, id, probes, i);
+            }
+            System.out.println("END");
+        }
+    }
+
+    private static int probeCount(byte[] bytes) {
+        final int[] count = new int[1];
+        ClassProbesVisitor visitor = new ClassProbesVisitor() {
+            @Override
+            public MethodProbesVisitor visitMethod(int access, String name, String desc, String signature,
+                                                   String[] exceptions) {
+                return null;
+            }
+
+            @Override
+            public void visitTotalProbeCount(int total) {
+                count[0] = total;
+            }
+        };
+        InstrSupport.classReaderFor(bytes).accept(new ClassProbesAdapter(visitor, false), 0);
+        return count[0];
+    }
+
+    private static void report(byte[] bytes, String name, long id, boolean[] probes, int probe) throws Exception {
+        ExecutionDataStore store = new ExecutionDataStore();
+        store.put(new ExecutionData(id, name, probes));
+        CoverageBuilder builder = new CoverageBuilder();
+        new Analyzer(store, builder).analyzeClass(bytes, name);
+        for (IClassCoverage coverage : builder.getClasses()) {
+            for (int nr = coverage.getFirstLine(); nr > 0 && nr <= coverage.getLastLine(); nr++) {
+                ILine line = coverage.getLine(nr);
+                if (probe < 0 && line.getInstructionCounter().getTotalCount() > 0) {
+                    System.out.println("LINE\\t" + nr + "\\t" + line.getInstructionCounter().getTotalCount()
+                        + "\\t" + line.getBranchCounter().getTotalCount());
+                } else if (probe >= 0 && line.getInstructionCounter().getCoveredCount() > 0) {
+                    System.out.println("PROBE\\t" + probe + "\\t" + nr + "\\t" + line.getInstructionCounter().getCoveredCount()
+                        + "\\t" + line.getBranchCounter().getCoveredCount());
+                }
+            }
+        }
+    }
+}
+"""
+
+
+logger = pantaLogger.initialize_logger(__name__)
+
+
+def version_tuple(version: str) -> tuple:
+    return tuple(int(number) for number in re.findall(r"\d+", version.split("-")[0]))
+
+
+def read_jacoco_plugin_version(project_dir: str):
+    """
+    :return: the version of the jacoco-maven-plugin of the build in the pom of the project, with the properties
+    of the pom resolved, None when the pom does not set it (e.g. it is inherited from a parent pom)
+    """
+    try:
+        root = ET.parse(os.path.join(project_dir, "pom.xml")).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    ns = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+    properties = {child.tag[len(ns):]: (child.text or "").strip() for child in root.findall(f"{ns}properties/*")}
+    builds = [root.find(f"{ns}build")] + root.findall(f"{ns}profiles/{ns}profile/{ns}build")
+    for build in builds:
+        if build is None:
+            continue
+        plugins = build.findall(f"{ns}plugins/{ns}plugin") + \
+            build.findall(f"{ns}pluginManagement/{ns}plugins/{ns}plugin")
+        for plugin in plugins:
+            if plugin.findtext(f"{ns}artifactId") != "jacoco-maven-plugin":
+                continue
+            version = re.sub(r"\$\{([^}]+)}", lambda match: properties.get(match.group(1), match.group(0)),
+                             (plugin.findtext(f"{ns}version") or "").strip())
+            if version and "${" not in version:
+                return version
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_jacoco_version(project_dir: str):
+    """
+    :return: the JaCoCo version of the agent which writes jacoco.exec, None when the probes cannot be mapped
+    with it and the execution data is read from the report goal instead
+    """
+    version = read_jacoco_plugin_version(project_dir)
+    if version is None:
+        logger.warning(f"The version of the jacoco-maven-plugin is not set in {project_dir}/pom.xml, "
+                       f"the coverage is read from the report of jacoco.exec.")
+    elif version_tuple(version) < MIN_JACOCO_VERSION:
+        logger.warning(f"The probes of JaCoCo {version} cannot be mapped to lines, "
+                       f"the coverage is read from the report of jacoco.exec.")
+        return None
+    return version
+
+
+class ExecDataReader:
+    """
+    Reader of the binary jacoco.exec format (version 0x1007):
+    a sequence of blocks, each starts with a type byte.
+        0x01 header: magic number 0xC0C0, format version
+        0x10 session info: id (UTF), start time (long), dump time (long)
+        0x11 execution data: class id (long), class name (UTF), probes (boolean array)
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def read(self, size):
+        value = self.data[self.pos:self.pos + size]
+        if len(value) != size:
+            raise ValueError("Truncated jacoco.exec file")
+        self.pos += size
+        return value
+
+    def read_byte(self):
+        return self.read(1)[0]
+
+    def read_char(self):
+        return struct.unpack(">H", self.read(2))[0]
+
+    def read_long(self):
+        return struct.unpack(">q", self.read(8))[0]
+
+    def read_utf(self):
+        return self.read(self.read_char()).decode("utf-8", errors="replace")
+
+    def read_var_int(self):
+        value, shift = 0, 0
+        while True:
+            byte = self.read_byte()
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value
+            shift += 7
+
+    def read_boolean_array(self):
+        length = self.read_var_int()
+        packed = self.read((length + 7) // 8)
+        return [bool(packed[i >> 3] & (1 << (i & 7))) for i in range(length)]
+
+    def read_execution_data(self):
+        """
+        :return: dict {class name: (class id, probes)}, the probes of the same class are merged over the sessions
+        """
+        execution_data = {}
+        while self.pos < len(self.data):
+            block = self.read_byte()
+            if block == BLOCK_HEADER:
+                if self.read_char() != EXEC_MAGIC_NUMBER:
+                    raise ValueError("Invalid jacoco.exec file")
+                self.read_char()
+            elif block == BLOCK_SESSION_INFO:
+                self.read_utf()
+                self.read_long()
+                self.read_long()
+            elif block == BLOCK_EXECUTION_DATA:
+                class_id = self.read_long() & 0xFFFFFFFFFFFFFFFF
+                name = self.read_utf()
+                probes = self.read_boolean_array()
+                if name in execution_data and execution_data[name][0] == class_id:
+                    probes = [a or b for a, b in zip(execution_data[name][1], probes)]
+                execution_data[name] = (class_id, probes)
+            else:
+                raise ValueError(f"Unknown block type {block:#x} in jacoco.exec")
+        return execution_data
+
+
+class JacocoExecCoverage(JacocoCoverage):
+    """
+    Coverage read from the jacoco.exec execution data, so the build does not need the JaCoCo report goal.
+    The probes are mapped to lines with a probe map per class, built once by analyzing the class with
+    the JaCoCo core of the version of the agent (read from the pom of the project) and cached by class id
+    in `.panta/jacoco-<version>/probe_maps`. When the version is unknown, the execution data is read from
+    the XML report of the report goal.
+
+    A line is covered when at least one probe covering it was hit, so the covered/not covered lines and
+    the line coverage are exact. The covered instructions and branches of a line are summed over the hit
+    probes (capped by the totals), so partially covered lines and the branch coverage are approximations.
+    All the classes of the source file (including nested classes) are counted.
+    """
+
+    def __init__(self, project_dir: str, file_path: str, src_file_path: str):
+        super().__init__(project_dir, file_path, src_file_path)
+        self.coverage_type = "jacoco_exec"
+        self.classes_dir = os.path.join(project_dir, "target", "classes")
+        self.cache_dir = os.path.join(project_dir, PANTA_CACHE_DIR)
+        # the probe maps and the probe mapper depend on the JaCoCo version
+        self.jacoco_version = get_jacoco_version(os.path.abspath(project_dir))
+        self.jacoco_dir = os.path.join(self.cache_dir, f"jacoco-{self.jacoco_version}")
+        self.probe_maps_dir = os.path.join(self.jacoco_dir, "probe_maps")
+
+    def parse_coverage_report(self) -> Tuple[list, list, float, float]:
+        lines_missed, branches_missed = [], []
+        covered_lines, total_branches, covered_branches = 0, 0, 0
+        line_counters = self.line_counters()
+        for nr, missed_instructions, covered_instructions, missed_branches, line_covered_branches in line_counters:
+            if covered_instructions:
+                covered_lines += 1
+            if missed_instructions:
+                lines_missed.append(nr)
+            if missed_branches:
+                branches_missed.append(nr)
+            total_branches += missed_branches + line_covered_branches
+            covered_branches += line_covered_branches
+
+        line_coverage_percentage = (float(covered_lines) / len(line_counters)) if line_counters else 0
+        branch_coverage_percentage = (float(covered_branches) / total_branches) if total_branches > 0 else 0
+        return lines_missed, branches_missed, line_coverage_percentage, branch_coverage_percentage
+
+    def parse_covered_bitsets(self) -> Tuple[int, int]:
+        return covered_bitsets(self.line_counters())
+
+    def line_counters(self) -> list:
+        """
+        :return: list of tuple (nr, mi, ci, mb, cb) sorted by line number, like the lines of jacoco.xml
+        """
+        package_name, class_name = self.extract_package_and_class_java()
+        if self.jacoco_version is None:
+            return self.report_line_counters(package_name, class_name)
+        class_path = f"{package_name.replace('.', '/')}/{class_name}" if package_name else class_name
+        with open(self.file_path, "rb") as f:
+            execution_data = ExecDataReader(f.read()).read_execution_data()
+
+        # all the classes compiled from the source file, the classes never loaded are not in the execution data
+        class_files = [os.path.join(self.classes_dir, f"{class_path}.class")] + \
+            sorted(glob.glob(os.path.join(self.classes_dir, glob.escape(class_path) + "$*.class")))
+        classes = {}
+        for class_file in class_files:
+            if not os.path.isfile(class_file):
+                continue
+            with open(class_file, "rb") as f:
+                name = os.path.relpath(class_file, self.classes_dir)[:-len(".class")].replace(os.sep, "/")
+                classes[name] = class_id(f.read())
+
+        probe_maps = self.load_probe_maps(classes)
+        lines = {}
+        covered = defaultdict(lambda: [0, 0])
+        for name, cid in classes.items():
+            probe_map = probe_maps.get(cid)
+            if probe_map is None:
+                continue
+            for nr, (total_instructions, total_branches) in probe_map["lines"].items():
+                line = lines.setdefault(int(nr), [0, 0])
+                line[0] += total_instructions
+                line[1] += total_branches
+
+            exec_id, probes = execution_data.get(name, (None, None))
+            if exec_id is None:
+                continue
+            if exec_id != cid:
+                self.logger.warning(f"The class file of {name} does not match the execution data, "
+                                    f"it was compiled again after the tests were run.")
+                continue
+            for probe, probe_lines in probe_map["probes"].items():
+                if probes[int(probe)]:
+                    for nr, covered_instructions, covered_branches in probe_lines:
+                        covered[nr][0] += covered_instructions
+                        covered[nr][1] += covered_branches
+
+        line_counters = []
+        for nr in sorted(lines):
+            total_instructions, line_branches = lines[nr]
+            covered_instructions = min(covered[nr][0], total_instructions) if nr in covered else 0
+            line_covered_branches = min(covered[nr][1], line_branches) if nr in covered else 0
+            line_counters.append((nr, total_instructions - covered_instructions, covered_instructions,
+                                  line_branches - line_covered_branches, line_covered_branches))
+        return line_counters
+
+    def report_line_counters(self, package_name, class_name) -> list:
+        """
+        run the report goal on jacoco.exec, with the plugin version of the project
+        :raises ValueError: when the report is not written
+        """
+        report_file = os.path.join(self.project_dir, JACOCO_REPORT_XML)
+        stdout, stderr, exit_code, time_of_command, _ = CommandExecutor.run_command(
+            JACOCO_REPORT_COMMAND.format(data_file=os.path.abspath(self.file_path)), cwd=self.project_dir,
+            timeout=300)
+        if exit_code != 0 or not os.path.isfile(report_file) \
+                or os.path.getmtime(report_file) * 1000 < time_of_command:
+            raise ValueError(f"The JaCoCo report of {self.file_path} was not written (exit code {exit_code}):\n"
+                             f"{stdout}{stderr}")
+        return sorted(iter_line_counters(self.project_dir, package_name, class_name, report_file))
+
+    def load_probe_maps(self, classes: dict) -> dict:
+        """
+        :param classes: dict {class name: class id}
+        :return: dict {class id: {"lines": {nr: [instructions, branches]}, "probes": {probe: [[nr, ci, cb]]}}}
+        """
+        probe_maps, missing = {}, []
+        for name, cid in classes.items():
+            map_file = os.path.join(self.probe_maps_dir, f"{cid:016x}.json")
+            if os.path.isfile(map_file):
+                with open(map_file, "r") as f:
+                    probe_maps[cid] = json.load(f)
+            else:
+                missing.append(name)
+        if missing:
+            probe_maps.update(self.build_probe_maps(missing))
+        return probe_maps
+
+    def build_probe_maps(self, missing: list) -> dict:
+        mapper_classpath = self.compile_probe_mapper()
+        if mapper_classpath is None:
+            return {}
+        command = ["java", "-cp", mapper_classpath, PROBE_MAPPER_CLASS_NAME]
+        for name in missing:
+            command += [os.path.join(self.classes_dir, f"{name}.class"), name]
+        p = subprocess.run(command, text=True, capture_output=True, timeout=300)
+        if p.returncode != 0:
+            self.logger.error(f"Failed to analyze the classes for the probe maps:\n{p.stderr}")
+            return {}
+
+        os.makedirs(self.probe_maps_dir, exist_ok=True)
+        probe_maps, probe_map, cid = {}, None, None
+        for line in p.stdout.splitlines():
+            values = line.split("\t")
+            if values[0] == "CLASS":
+                cid = int(values[1], 16)
+                probe_map = {"lines": {}, "probes": defaultdict(list)}
+            elif values[0] == "LINE":
+                probe_map["lines"][values[1]] = [int(values[2]), int(values[3])]
+            elif values[0] == "PROBE":
+                probe_map["probes"][values[1]].append([int(values[2]), int(values[3]), int(values[4])])
+            elif values[0] == "END":
+                probe_maps[cid] = probe_map
+                with open(os.path.join(self.probe_maps_dir, f"{cid:016x}.json"), "w") as f:
+                    json.dump(probe_map, f)
+        return probe_maps
+
+    def compile_probe_mapper(self):
+        jacoco_classpath = self.find_jacoco_core_classpath()
+        mapper_dir = os.path.join(self.jacoco_dir, "probe_mapper")
+        classpath = os.pathsep.join([mapper_dir, jacoco_classpath])
+        if os.path.isfile(os.path.join(mapper_dir, f"{PROBE_MAPPER_CLASS_NAME}.class")):
+            return classpath
+        os.makedirs(mapper_dir, exist_ok=True)
+        source_file = os.path.join(mapper_dir, f"{PROBE_MAPPER_CLASS_NAME}.java")
+        with open(source_file, "w") as f:
+            f.write(PROBE_MAPPER)
+        p = subprocess.run(["javac", "-nowarn", "-d", mapper_dir, "-cp", jacoco_classpath, source_file],
+                           text=True, capture_output=True)
+        if p.returncode != 0:
+            self.logger.error(f"Failed to compile the probe mapper:\n{p.stderr}")
+            return None
+        return classpath
+
+    def find_jacoco_core_classpath(self):
+        """
+        resolve the classpath of the JaCoCo core of the agent version and the asm version it depends on,
+        cached in `.panta/jacoco-<version>/classpath.txt`
+        :raises RuntimeError: when the classpath cannot be resolved, the probes cannot be mapped to lines
+        """
+        classpath_file = os.path.join(self.jacoco_dir, "classpath.txt")
+        classpath = self.read_jacoco_core_classpath(classpath_file, self.jacoco_version)
+        if classpath is None:
+            os.makedirs(self.jacoco_dir, exist_ok=True)
+            with open(os.path.join(self.jacoco_dir, "pom.xml"), "w") as f:
+                f.write(JACOCO_CORE_POM.format(version=self.jacoco_version))
+            stdout, stderr, exit_code, _, _ = CommandExecutor.run_command(
+                JACOCO_CORE_CLASSPATH_COMMAND.format(output_file=classpath_file), cwd=self.jacoco_dir, timeout=300)
+            classpath = self.read_jacoco_core_classpath(classpath_file, self.jacoco_version)
+            if classpath is None:
+                raise RuntimeError(f"Cannot resolve the classpath of the JaCoCo core {self.jacoco_version}, "
+                                   f"the probes of jacoco.exec cannot be mapped to lines (exit code {exit_code}):\n"
+                                   f"{stdout}{stderr}")
+        return classpath
+
+    @staticmethod
+    def read_jacoco_core_classpath(classpath_file, version):
+        """
+        :return: the cached classpath, None if it is missing, does not contain the core of the version
+        or one of its jars was removed from the local repository
+        """
+        if not os.path.isfile(classpath_file):
+            return None
+        with open(classpath_file, "r") as f:
+            classpath = f.read().strip()
+        jars = classpath.split(os.pathsep) if classpath else []
+        if not any(os.path.basename(jar) == f"org.jacoco.core-{version}.jar" for jar in jars) \
+                or not all(os.path.isfile(jar) for jar in jars):
+            return None
+        return classpath
@@ -1,10 +1,8 @@
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+from array import array
 
-
-def read_html_file(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
+# status of the jacoco counters (ICounter), the status of a line is the union of its instruction and branch status
+EMPTY, NOT_COVERED, FULLY_COVERED, PARTLY_COVERED = 0, 1, 2, 3
 
 
 def parse_method_with_missed_lines(project_dir: str, package_name: str, class_name: str) -> list[tuple]:
@@ -63,36 +61,89 @@ def parse_method_with_missed_branches(project_dir: str, package_name: str, class
     return methods_with_missed_branches
 
 
+def iter_line_counters(project_dir: str, package_name: str, class_name: str, coverage_report_path: str = None):
+    """
+    stream jacoco.xml and yield the <line nr mi ci mb cb> elements of the source file
+    {package_name}/{class_name}.java, the parsing stops after the source file.
+    :param coverage_report_path: the XML report, `{project_dir}/target/jacoco/jacoco.xml` by default
+    :return: generator of tuple (nr, mi, ci, mb, cb)
+    """
+    coverage_report_path = coverage_report_path or f"{project_dir}/target/jacoco/jacoco.xml"
+    package_path = package_name.replace(".", "/")
+    source_file_name = f"{class_name}.java"
+
+    current_package = None
+    in_source_file = False
+    for event, element in ET.iterparse(coverage_report_path, events=("start", "end")):
+        if event == "start":
+            if element.tag == "package":
+                current_package = element.get("name")
+            elif element.tag == "sourcefile":
+                in_source_file = current_package == package_path and element.get("name") == source_file_name
+            continue
+
+        if element.tag == "line" and in_source_file:
+            yield (int(element.get("nr")), int(element.get("mi")), int(element.get("ci")),
+                   int(element.get("mb")), int(element.get("cb")))
+        elif element.tag == "sourcefile":
+            if in_source_file:
+                break
+            element.clear()
+        elif element.tag in ("class", "package"):
+            element.clear()
+
+
+def counter_status(missed: int, covered: int) -> int:
+    """
+    status of a jacoco counter: 0 empty, 1 not covered, 2 fully covered, 3 partly covered
+    """
+    return (NOT_COVERED if missed else EMPTY) | (FULLY_COVERED if covered else EMPTY)
+
+
+def classify_line_counters(line_counters):
+    """
+    classify the lines as the HTML report does, the status of a line combines the status of its instructions
+    and of its branches, so a line with missed branches is not fully covered (class 'pc bpc' or 'pc bnc').
+    :param line_counters: iterable of tuple (nr, mi, ci, mb, cb)
+    :return: dict of line numbers, each value is an array('i')
+    """
+    coverage = {key: array("i") for key in ["branch_not_covered", "branch_partially_covered",
+                                             "lines_not_covered", "lines_partially_covered", "lines_fully_covered"]}
+    line_keys = {NOT_COVERED: "lines_not_covered", PARTLY_COVERED: "lines_partially_covered",
+                 FULLY_COVERED: "lines_fully_covered"}
+    for line_number, missed_instructions, covered_instructions, missed_branches, covered_branches in line_counters:
+        status = (counter_status(missed_instructions, covered_instructions)
+                  | counter_status(missed_branches, covered_branches))
+        if status != EMPTY:
+            coverage[line_keys[status]].append(line_number)
+        if missed_branches:
+            coverage["branch_partially_covered" if covered_branches else "branch_not_covered"].append(line_number)
+    return coverage
+
+
+def covered_bitsets(line_counters):
+    """
+    encode the covered lines and branches as bitsets, so the coverage of two runs can be compared with bit operations.
+    bit `nr` is set for a covered line, the branches of each line take consecutive bits (in line order),
+    the first `cb` of them are set.
+    :param line_counters: iterable of tuple (nr, mi, ci, mb, cb), sorted by line number
+    :return: tuple (line bits, branch bits)
+    """
+    line_bits, branch_bits, branch_offset = 0, 0, 0
+    for line_number, _, covered_instructions, missed_branches, covered_branches in line_counters:
+        if covered_instructions:
+            line_bits |= 1 << line_number
+        branch_bits |= ((1 << covered_branches) - 1) << branch_offset
+        branch_offset += missed_branches + covered_branches
+    return line_bits, branch_bits
+
+
 def parse_missed_line_branch_locations(project_dir: str, package_name: str, class_name: str):
     """
-    parse {package_name}/{class_name}.java.html to identify missed lines/branches
+    identify missed lines/branches from the <line nr mi ci mb cb> elements of jacoco.xml
     :param project_dir:
     :param package_name:
     :param class_name:
-    :return:
+    :return: dict of line numbers, each value is an array('i')
     """
-    coverage = {}
-    html_file = f"{project_dir}/target/jacoco/{package_name}/{class_name}.java.html"
-    html_content = read_html_file(html_file)
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    elements_with_bnc_class = soup.find_all(class_='nc bnc')
-    bnc_ids = [int(element.get('id').strip('L')) for element in elements_with_bnc_class if element.get('id')]
-    coverage["branch_not_covered"] = bnc_ids
-
-    elements_with_bpc_class = soup.find_all(class_='pc bpc')
-    bpc_ids = [int(element.get('id').strip('L')) for element in elements_with_bpc_class if element.get('id')]
-    coverage["branch_partially_covered"] = bpc_ids
-
-    elements_with_nc_class = soup.find_all(class_='nc')
-    nc_ids = [int(element.get('id').strip('L')) for element in elements_with_nc_class if element.get('id')]
-    coverage["lines_not_covered"] = nc_ids
-
-    elements_with_pc_class = soup.find_all(class_='pc')
-    pc_ids = [int(element.get('id').strip('L')) for element in elements_with_pc_class if element.get('id')]
-    coverage["lines_partially_covered"] = pc_ids
-
-    elements_with_fc_class = soup.find_all(class_='fc')
-    fc_ids = [int(element.get('id').strip('L')) for element in elements_with_fc_class if element.get('id')]
-    coverage["lines_fully_covered"] = fc_ids
-    return coverage
+    return classify_line_counters(iter_line_counters(project_dir, package_name, class_name))
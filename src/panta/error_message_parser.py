@@ -1,5 +1,6 @@
 import logging
 import re
+import xml.etree.ElementTree as ET
 from .constants_config import MAX_DISPLAY_LINES
 
 
@@ -67,4 +68,57 @@ def extract_compilation_error_message_java(fail_message):
 
 def strip_ansi(text):
     ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
-    return ansi_escape.sub('', text)
\ No newline at end of file
+    return ansi_escape.sub('', text)
+
+def extract_compilation_error_lines_java(fail_message, file_name):
+    """
+    map the compilation errors of a java file to line numbers, supports both the maven
+    format `File.java:[12,5] message` and the javac format `File.java:12: error: message`
+    :return: dict {line_number: [error lines]}, errors in other files are ignored
+    """
+    fail_message = strip_ansi(fail_message or "")
+    pattern = re.compile(re.escape(file_name) + r":\[?(\d+)")
+    errors = {}
+    for line in fail_message.split("\n"):
+        match = pattern.search(line)
+        if match:
+            errors.setdefault(int(match.group(1)), []).append(line.strip())
+    return errors
+
+
+def extract_test_failure_messages_java(fail_message):
+    """
+    extract the failure message of each test method from the runner/surefire console output
+    :return: dict {test_name: error message}
+    """
+    fail_message = strip_ansi(fail_message or "")
+    pattern = r"(?:^|\n)(?:[\w.$]+\.)?(\w+)(?:\([\w.$]+\))?\s+Time elapsed:[^\n]*<<< (?:FAILURE|ERROR)!([\s\S]+?)(?:\n{2}|\Z)"
+    failures = {}
+    for test_name, message in re.findall(pattern, fail_message):
+        failures[test_name] = (failures.get(test_name, "") + message).strip("\n")
+    return failures
+
+
+def parse_surefire_test_results(report_file):
+    """
+    parse a surefire xml report `TEST-{test_class}.xml`
+    :return: dict {test_name: error message}, the error message is empty for passed tests
+    """
+    results = {}
+    try:
+        root = ET.parse(report_file).getroot()
+    except (ET.ParseError, OSError) as e:
+        logging.error(f"Error parsing surefire report: {e}")
+        return results
+    for testcase in root.iter("testcase"):
+        error_message = ""
+        for tag in ["failure", "error"]:
+            for element in testcase.findall(tag):
+                message = element.get("message") or ""
+                error_message += f"{element.get('type', tag)}: {message}\n{(element.text or '').strip()}\n"
+        error_lines = error_message.strip("\n").split("\n")
+        if len(error_lines) > MAX_DISPLAY_LINES:
+            # limit the number of lines to display so that we do not exceed the context window limit
+            error_message = "\n".join(error_lines[:MAX_DISPLAY_LINES]) + "\n..."
+        results[testcase.get("name")] = error_message.strip("\n")
+    return results
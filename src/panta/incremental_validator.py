@@ -0,0 +1,290 @@
+import hashlib
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+
+from .command_executor import CommandExecutor, popen_in_new_session
+from .panta_logger import pantaLogger
+from .utils import read_file
+
+PANTA_CACHE_DIR = ".panta"
+RUNNER_CLASS_NAME = "PantaTestRunner"
+TEST_RESULT_PREFIX = "PANTA_TEST"
+
+CLASSPATH_COMMAND = "mvn -q dependency:build-classpath -Dmdep.includeScope=test -Dmdep.outputFile={output_file}"
+
+# Runner for JUnit 3 style test classes (junit.framework.TestCase)
+JUNIT_3_RUNNER = """
+import java.util.Enumeration;
+import junit.framework.Test;
+import junit.framework.TestFailure;
+import junit.framework.TestResult;
+import junit.framework.TestSuite;
+
+public class PantaTestRunner {
+    public static void main(String[] args) throws Exception {
+        Class<?> testClass = Class.forName(args[0]);
+        boolean passed = true;
+        for (int i = 1; i < args.length; i++) {
+            Test test = TestSuite.createTest(testClass, args[i]);
+            TestResult result = new TestResult();
+            test.run(result);
+            boolean ok = result.wasSuccessful() && result.runCount() > 0;
+            report(args[i], testClass.getName(), result.errors());
+            report(args[i], testClass.getName(), result.failures());
+            System.out.println("PANTA_TEST\\t" + args[i] + "\\t" + (ok ? "PASS" : "FAIL"));
+            passed &= ok;
+        }
+        System.exit(passed ? 0 : 1);
+    }
+
+    private static void report(String method, String className, Enumeration failures) {
+        while (failures.hasMoreElements()) {
+            TestFailure failure = (TestFailure) failures.nextElement();
+            System.out.println(method + "(" + className + ")  Time elapsed: 0 s  <<< FAILURE!");
+            System.out.println(failure.trace());
+            System.out.println();
+        }
+    }
+}
+"""
+
+# Runner for JUnit 4 test classes, JUnitCore also handles JUnit 3 classes
+JUNIT_4_RUNNER = """
+import org.junit.runner.JUnitCore;
+import org.junit.runner.Request;
+import org.junit.runner.Result;
+import org.junit.runner.notification.Failure;
+
+public class PantaTestRunner {
+    public static void main(String[] args) throws Exception {
+        Class<?> testClass = Class.forName(args[0]);
+        boolean passed = true;
+        for (int i = 1; i < args.length; i++) {
+            Result result = new JUnitCore().run(Request.method(testClass, args[i]));
+            boolean ok = result.wasSuccessful() && result.getRunCount() > 0;
+            for (Failure failure : result.getFailures()) {
+                System.out.println(args[i] + "(" + testClass.getName() + ")  Time elapsed: 0 s  <<< FAILURE!");
+                System.out.println(failure.getTrace());
+                System.out.println();
+            }
+            System.out.println("PANTA_TEST\\t" + args[i] + "\\t" + (ok ? "PASS" : "FAIL"));
+            passed &= ok;
+        }
+        System.exit(passed ? 0 : 1);
+    }
+}
+"""
+
+# Runner for JUnit 5 test classes, requires junit-platform-launcher on the test classpath
+JUNIT_5_RUNNER = """
+import java.io.PrintWriter;
+import java.io.StringWriter;
+import org.junit.platform.engine.discovery.DiscoverySelectors;
+import org.junit.platform.launcher.Launcher;
+import org.junit.platform.launcher.LauncherDiscoveryRequest;
+import org.junit.platform.launcher.core.LauncherDiscoveryRequestBuilder;
+import org.junit.platform.launcher.core.LauncherFactory;
+import org.junit.platform.launcher.listeners.SummaryGeneratingListener;
+import org.junit.platform.launcher.listeners.TestExecutionSummary;
+
+public class PantaTestRunner {
+    public static void main(String[] args) throws Exception {
+        Class<?> testClass = Class.forName(args[0]);
+        Launcher launcher = LauncherFactory.create();
+        boolean passed = true;
+        for (int i = 1; i < args.length; i++) {
+            LauncherDiscoveryRequest request = LauncherDiscoveryRequestBuilder.request()
+                .selectors(DiscoverySelectors.selectMethod(testClass, args[i])).build();
+            SummaryGeneratingListener listener = new SummaryGeneratingListener();
+            launcher.execute(request, listener);
+            TestExecutionSummary summary = listener.getSummary();
+            boolean ok = summary.getTotalFailureCount() == 0 && summary.getTestsSucceededCount() > 0;
+            for (TestExecutionSummary.Failure failure : summary.getFailures()) {
+                StringWriter trace = new StringWriter();
+                failure.getException().printStackTrace(new PrintWriter(trace));
+                System.out.println(args[i] + "(" + testClass.getName() + ")  Time elapsed: 0 s  <<< FAILURE!");
+                System.out.println(trace);
+                System.out.println();
+            }
+            System.out.println("PANTA_TEST\\t" + args[i] + "\\t" + (ok ? "PASS" : "FAIL"));
+            passed &= ok;
+        }
+        System.exit(passed ? 0 : 1);
+    }
+}
+"""
+
+JUNIT_RUNNERS = {3: JUNIT_3_RUNNER, 4: JUNIT_4_RUNNER, 5: JUNIT_5_RUNNER}
+
+
+def extract_package_name(test_code):
+    match = re.search(r'^\s*package\s+([\w.]+)\s*;', test_code, re.MULTILINE)
+    return match.group(1) if match else ""
+
+
+def get_test_method_name(generated_test: dict):
+    """
+    the method name declared in the test code, falls back to the `test_name` given by the LLM
+    """
+    test_code = generated_test.get("test_code", "") or ""
+    match = re.search(r'\bvoid\s+(\w+)\s*\(', test_code)
+    if match:
+        return match.group(1)
+    return (generated_test.get("test_name", "") or "").strip()
+
+
+def parse_test_results(stdout):
+    """
+    parse the per-method result lines printed by the runner
+    :return: dict {test_name: True/False}
+    """
+    results = {}
+    for line in (stdout or "").splitlines():
+        if line.startswith(TEST_RESULT_PREFIX):
+            values = line.split("\t")
+            if len(values) == 3:
+                results[values[1]] = values[2].strip() == "PASS"
+    return results
+
+
+class IncrementalValidator:
+    """
+    Validate a generated test by compiling only the test class against a cached project classpath
+    and running only the new test method, instead of running the whole build command.
+    The build command is still used for collecting the coverage report.
+    """
+
+    def __init__(self, project_dir: str, test_code_file: str, test_code_command_dir: str, junit_version: int = 4,
+                 command_executor=CommandExecutor):
+        self.project_dir = project_dir
+        self.test_code_file = test_code_file
+        self.test_code_command_dir = test_code_command_dir or project_dir
+        self.junit_version = junit_version if junit_version in JUNIT_RUNNERS else 4
+        self.command_executor = command_executor
+        self.logger = pantaLogger.initialize_logger(__name__)
+
+        self.cache_dir = os.path.abspath(os.path.join(self.test_code_command_dir, PANTA_CACHE_DIR))
+        self.classes_dir = os.path.abspath(os.path.join(self.test_code_command_dir, "target", "classes"))
+        self.test_classes_dir = os.path.abspath(os.path.join(self.test_code_command_dir, "target", "test-classes"))
+        self.runner_dir = os.path.join(self.cache_dir, "runner", f"junit{self.junit_version}")
+        self.dependency_classpath = None
+        self.available = None
+
+    def prepare(self) -> bool:
+        """
+        resolve the dependency classpath and compile the test runner once.
+        :return: False if the incremental mode cannot be used, the caller falls back to the build command
+        """
+        if self.available is not None:
+            return self.available
+        self.available = False
+        if not shutil.which("javac") or not shutil.which("java"):
+            self.logger.warning("javac/java not found, incremental validation is disabled.")
+            return self.available
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.dependency_classpath = self.resolve_dependency_classpath()
+            if self.dependency_classpath is None:
+                return self.available
+            self.available = self.compile_runner()
+        except Exception as e:
+            self.logger.error(f"Error preparing incremental validation: {e}")
+        return self.available
+
+    def resolve_dependency_classpath(self):
+        """
+        the classpath is cached in `.panta/classpath.txt` and only resolved again when pom.xml changes
+        """
+        classpath_file = os.path.join(self.cache_dir, "classpath.txt")
+        key_file = os.path.join(self.cache_dir, "classpath.key")
+        pom_file = os.path.join(self.test_code_command_dir, "pom.xml")
+        pom_key = hashlib.sha256(read_file(pom_file).encode()).hexdigest()
+
+        if os.path.isfile(classpath_file) and os.path.isfile(key_file) and read_file(key_file) == pom_key:
+            return read_file(classpath_file).strip()
+
+        command = CLASSPATH_COMMAND.format(output_file=classpath_file)
+        self.logger.info(f'Resolve test classpath with the command: "{command}"')
+        stdout, stderr, exit_code, _, _ = self.command_executor.run_command(
+            command=command, cwd=self.test_code_command_dir, timeout=300
+        )
+        if exit_code != 0 or not os.path.isfile(classpath_file):
+            self.logger.warning(f"Failed to resolve the test classpath, incremental validation is disabled.\n{stdout}")
+            return None
+        with open(key_file, "w") as f:
+            f.write(pom_key)
+        return read_file(classpath_file).strip()
+
+    def compile_runner(self) -> bool:
+        runner_class = os.path.join(self.runner_dir, f"{RUNNER_CLASS_NAME}.class")
+        if os.path.isfile(runner_class):
+            return True
+        os.makedirs(self.runner_dir, exist_ok=True)
+        runner_source = os.path.join(self.runner_dir, f"{RUNNER_CLASS_NAME}.java")
+        with open(runner_source, "w") as f:
+            f.write(JUNIT_RUNNERS[self.junit_version])
+        stdout, stderr, exit_code = self.javac(runner_source, self.runner_dir)
+        if exit_code != 0:
+            self.logger.warning(f"Failed to compile the test runner, incremental validation is disabled.\n{stderr}")
+            return False
+        return True
+
+    def compile_classpath(self):
+        return os.pathsep.join([self.test_classes_dir, self.classes_dir, self.dependency_classpath])
+
+    def run_classpath(self):
+        return os.pathsep.join([self.runner_dir, self.compile_classpath()])
+
+    def javac(self, source_file, output_dir, timeout=60):
+        command = ["javac", "-nowarn", "-encoding", "UTF-8", "-d", output_dir,
+                   "-cp", self.compile_classpath(), source_file]
+        try:
+            p = subprocess.run(command, cwd=self.test_code_command_dir, text=True,
+                               capture_output=True, timeout=timeout)
+            return p.stdout, p.stderr, p.returncode
+        except subprocess.TimeoutExpired:
+            return "Timeout", None, -1
+
+    def test_class_name(self):
+        class_name = os.path.splitext(os.path.basename(self.test_code_file))[0]
+        package_name = extract_package_name(read_file(self.test_code_file))
+        return f"{package_name}.{class_name}" if package_name else class_name
+
+    def run_tests(self, test_names: list, timeout=60):
+        """
+        compile the test class and run the given test methods.
+
+        Returns:
+            tuple: the same tuple as `CommandExecutor.run_command`, so the caller handles the
+            result of the incremental run and the full build command in the same way.
+        """
+        command_start_time = int(round(time.time() * 1000))
+        os.makedirs(self.test_classes_dir, exist_ok=True)
+        stdout, stderr, exit_code = self.javac(os.path.abspath(self.test_code_file), self.test_classes_dir)
+        if exit_code != 0:
+            if stdout == "Timeout":
+                return "Timeout", None, -1, None, None
+            # keep the maven error format so that the compilation error parser works for both modes
+            error_lines = [f"[ERROR] {line}" for line in (stderr or stdout).splitlines() if line.strip()]
+            stdout = "COMPILATION ERROR : \n" + "\n".join(error_lines) + "\n"
+            command_duration = int(round(time.time() * 1000)) - command_start_time
+            return stdout, stderr, exit_code, command_start_time, command_duration
+
+        command = ["java", "-cp", self.run_classpath(), RUNNER_CLASS_NAME, self.test_class_name()] + list(test_names)
+        self.logger.info(f'Run test methods: {", ".join(test_names)}')
+        with popen_in_new_session(command, cwd=self.test_code_command_dir, text=True,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE) as p:
+            try:
+                stdout, stderr = p.communicate(timeout=timeout)
+                command_duration = int(round(time.time() * 1000)) - command_start_time
+                return stdout, stderr, p.returncode, command_start_time, command_duration
+            except subprocess.TimeoutExpired:
+                os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+                return "Timeout", None, -1, None, None
+
+    def run_test(self, test_name: str, timeout=60):
+        return self.run_tests([test_name], timeout)
@@ -4,13 +4,39 @@ import os
 from .panta import Panta
 
 
-def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
+# environment variable with the path of the config file, used when no path is given
+CONFIG_ENV_VAR = "PANTA_CONFIG"
+
+
+def load_config(config_path=None, overrides: dict = None):
+    """
+    read the config file: the given path, else $PANTA_CONFIG, else panta/config.ini.
+    The file is only read, every run gets its own copy of the values.
+    :param overrides: values replacing the ones of the file
+    """
+    config_path = config_path or os.environ.get(CONFIG_ENV_VAR) or os.path.join(os.path.dirname(__file__), 'config.ini')
+    if not os.path.isfile(config_path):
+        raise FileNotFoundError(f"Config file not found at {config_path}")
     confparser = configparser.ConfigParser()
     confparser.read(config_path)
+    if overrides:
+        confparser.read_dict({'default': {key: str(value) for key, value in overrides.items()}})
     return confparser['default']
 
 
+def parse_overrides(assignments):
+    """
+    :param assignments: list of "key=value" strings
+    """
+    overrides = {}
+    for assignment in assignments or []:
+        key, separator, value = assignment.partition("=")
+        if not separator or not key.strip():
+            raise ValueError(f"Invalid config override \"{assignment}\", expected key=value")
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+
 def config_to_namespace(config):
     return argparse.Namespace(
         project_directory=config.get('project_directory'),
@@ -34,19 +60,53 @@ def config_to_namespace(config):
         prompt_type=config.get('prompt_type'),
         test_generation_strategy=config.get('test_generation_strategy', 'cfg_branch_analyzer'),
         fix_type=config.get('fix_type', 'MCTS'),
+        validation_mode=config.get('validation_mode', 'full'),
+        batch_validation=config.getboolean('batch_validation', False),
+        validation_workers=config.getint('validation_workers', 1),
+        executor_backend=config.get('executor_backend', 'subprocess'),
+        cfg_cache_dir=config.get('cfg_cache_dir', ''),
+        llm_concurrency=config.getint('llm_concurrency', 1),
+        llm_print_tokens=config.getboolean('llm_print_tokens', True),
+        llm_cache_mode=config.get('llm_cache_mode', 'bypass'),
+        llm_cache_dir=config.get('llm_cache_dir', '.panta/llm_cache'),
+        llm_cache_max_mb=config.getint('llm_cache_max_mb', 1024),
+        reject_redundant_tests=config.getboolean('reject_redundant_tests', False),
+        prompt_token_budget=config.getint('prompt_token_budget', 0),
+        context_slicing=config.getboolean('context_slicing', False),
         pick_two_paths=config.getboolean("pick_two_paths"),
         additional_instructions=config.get('additional_instructions')
     )
 
 
-def main():
-    config_parser = load_config()
-    args = config_to_namespace(config_parser)
+def run(config=None, **overrides) -> Panta:
+    """
+    programmatic entry point, runs the test generation of one class in the current process.
+    :param config: path of a config file, or a namespace as returned by `config_to_namespace`
+    :param overrides: config values replacing the ones of the config
+    :return: the Panta instance, with the state of the test generation
+    """
+    if isinstance(config, argparse.Namespace):
+        args = argparse.Namespace(**vars(config))
+        for key, value in overrides.items():
+            setattr(args, key, value)
+    else:
+        args = config_to_namespace(load_config(config, overrides))
     panta = Panta(args)
     if args.run_symprompt:
         panta.run_symprompt()
     else:
         panta.run()
+    return panta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate unit tests for the class configured in config.ini.")
+    parser.add_argument("--config", default=None,
+                        help=f"config file to use instead of panta/config.ini (default: ${CONFIG_ENV_VAR})")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a value of the config file, can be repeated")
+    cli_args = parser.parse_args()
+    run(cli_args.config, **parse_overrides(cli_args.overrides))
 
 
 if __name__ == "__main__":
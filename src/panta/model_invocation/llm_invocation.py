@@ -1,63 +1,70 @@
+import asyncio
 import time
 import random
-import tiktoken
-import litellm
-import openai
 
+# litellm, openai and tiktoken take seconds to import, they are imported on the first call of a backend
 
-class LLMInvocation:
-    def __init__(self, model: str):
-        self.model = model
 
-    def call_model(self, prompt: dict, max_tokens=4096, temperature=0.2):
-        """
-        Returns:
-            tuple: A tuple containing the response generated by the LLM,
-            the number of tokens used from the prompt, and the total number of tokens in the response.
-        """
-        if "system" not in prompt or "user" not in prompt:
-            raise KeyError("The prompt dictionary must contain 'system' and 'user' keys.")
+def build_messages(prompt: dict):
+    if "system" not in prompt or "user" not in prompt:
+        raise KeyError("The prompt dictionary must contain 'system' and 'user' keys.")
+
+    if prompt["system"] == "":
+        return [{"role": "user", "content": prompt["user"]}]
+    return [
+        {"role": "system", "content": prompt["system"]},
+        {"role": "user", "content": prompt["user"]},
+    ]
 
-        if prompt["system"] == "":
-            messages = [{"role": "user", "content": prompt["user"]}]
-        else:
-            messages = [
-                {"role": "system", "content": prompt["system"]},
-                {"role": "user", "content": prompt["user"]},
-            ]
 
+class LLMInvocation:
+    def __init__(self, model: str, print_tokens: bool = True):
+        self.model = model
+        # print the streamed tokens to the console, the concurrent calls never print
+        self.print_tokens = print_tokens
+
+    def completion_params(self, messages, max_tokens, temperature, stream=True):
         if self.model == "deepseek-r1":
             # sample input
-            completion_params = {
+            return {
                 "model": "sagemaker/endpoint-deepseek-r1-nashid",
                 "messages": [{"role": "user", "content": "Are you better than GPT-4o for test generation and why?"}],
                 "max_tokens": max_tokens,
-                "stream": True,
+                "stream": stream,
                 "temperature": temperature,
                 "aws_region_name": "us-east-2"
             }
-        else:
-            completion_params = {
-                "model": self.model,
-                "messages": messages,
-                "max_tokens": max_tokens,
-                "stream": True,
-                "temperature": temperature,
-            }
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "stream": stream,
+            "temperature": temperature,
+        }
+
+    def call_model(self, prompt: dict, max_tokens=4096, temperature=0.2):
+        """
+        Returns:
+            tuple: A tuple containing the response generated by the LLM,
+            the number of tokens used from the prompt, and the total number of tokens in the response.
+        """
+        messages = build_messages(prompt)
+        completion_params = self.completion_params(messages, max_tokens, temperature)
 
         max_retries = 5
         base_delay = 2  # base delay in seconds
 
+        import litellm
         for attempt in range(max_retries):
             try:
                 response = litellm.completion(**completion_params)
                 chunks = []
                 try:
                     for chunk in response:
-                        print(
-                            chunk.choices[0].delta.content or "", end="", flush=True)
+                        if self.print_tokens:
+                            print(
+                                chunk.choices[0].delta.content or "", end="", flush=True)
                         chunks.append(chunk)
-                        time.sleep(0.01)
                 except Exception as e:
                     print(f"Error during streaming: {e}")
                 print("\n")
@@ -78,39 +85,115 @@ class LLMInvocation:
         raise RuntimeError(
             "Max retries exceeded. Could not complete API call.")
 
+    def async_client(self):
+        """
+        client for the asynchronous calls, created for each event loop
+        """
+        return None
+
+    async def acompletion(self, client, completion_params):
+        import litellm
+        response = await litellm.acompletion(**completion_params)
+        return (
+            response["choices"][0]["message"]["content"],
+            int(response["usage"]["prompt_tokens"]),
+            int(response["usage"]["completion_tokens"]),
+        )
+
+    async def acall_model(self, prompt: dict, max_tokens=4096, temperature=0.2, client=None):
+        """
+        asynchronous version of `call_model`, the response is not streamed.
+
+        Returns:
+            tuple: the same tuple as `call_model`
+        """
+        messages = build_messages(prompt)
+        completion_params = self.completion_params(messages, max_tokens, temperature, stream=False)
+
+        max_retries = 5
+        base_delay = 2  # base delay in seconds
+
+        for attempt in range(max_retries):
+            try:
+                return await self.acompletion(client, completion_params)
+            except Exception as e:
+                delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
+                print(f"API Error: {e}")
+                print(f"Rate limit exceeded. "
+                      f"Retrying in {delay:.2f} seconds... "
+                      f"(Attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(delay)
+
+        raise RuntimeError(
+            "Max retries exceeded. Could not complete API call.")
+
+    async def acall_models(self, prompts: list, max_tokens=4096, temperature=0.2, concurrency=4):
+        """
+        issue the prompts concurrently, at most `concurrency` requests are in flight.
+
+        Returns:
+            list: the tuple of `call_model` for each prompt, in the same order as `prompts`
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        client = self.async_client()
+
+        async def call(prompt):
+            async with semaphore:
+                return await self.acall_model(prompt, max_tokens, temperature, client)
+
+        try:
+            return await asyncio.gather(*[call(prompt) for prompt in prompts])
+        finally:
+            if client is not None:
+                await client.close()
+
+    def call_models(self, prompts: list, max_tokens=4096, temperature=0.2, concurrency=4):
+        """
+        synchronous wrapper of `acall_models`
+        """
+        return asyncio.run(self.acall_models(prompts, max_tokens, temperature, concurrency))
 
 
 class AzureOpenAIInvocation(LLMInvocation):
-    def __init__(self, model: str, base_url: str, api_version: str, ak: str):
-        super().__init__(model)
+    def __init__(self, model: str, base_url: str, api_version: str, ak: str, print_tokens: bool = True):
+        super().__init__(model, print_tokens)
+        import openai
+        self.base_url = base_url
+        self.api_version = api_version
+        self.ak = ak
         self.client = openai.AzureOpenAI(
             azure_endpoint=base_url,
             api_version=api_version,
             api_key=ak,
         )
-        
-    def call_model(self, prompt: dict, max_tokens=4096, temperature=0.2):
-        if "system" not in prompt or "user" not in prompt:
-            raise KeyError(
-                "The prompt dictionary must contain 'system' and 'user' keys.")
-
-        if prompt["system"] == "":
-            messages = [{"role": "user", "content": prompt["user"]}]
-        else:
-            messages = [
-                {"role": "system", "content": prompt["system"]},
-                {"role": "user", "content": prompt["user"]},
-            ]
-
-        completion_params = {
+
+    def completion_params(self, messages, max_tokens, temperature, stream=True):
+        return {
             "model": self.model,
             "messages": messages,
             "max_tokens": max_tokens,
-            "stream": True,
+            "stream": stream,
             "temperature": temperature,
             "extra_headers": {"X-TT-LOGID": ""},
         }
-        
+
+    def count_tokens(self, messages, content):
+        try:
+            import tiktoken
+            encoding = tiktoken.encoding_for_model(self.model)
+            prompt_text = " ".join(msg["content"] for msg in messages)
+            prompt_tokens = len(encoding.encode(prompt_text))
+            completion_tokens = len(encoding.encode(content))
+        except Exception:
+            # 如果tiktoken失败，回退到近似计算
+            prompt_tokens = int(len(" ".join(msg["content"] for msg in messages).split()) * 1.3)
+            completion_tokens = int(len(content.split()) * 1.3)
+        return prompt_tokens, completion_tokens
+
+    def call_model(self, prompt: dict, max_tokens=4096, temperature=0.2):
+        messages = build_messages(prompt)
+        completion_params = self.completion_params(messages, max_tokens, temperature)
+
         max_retries = 5
         base_delay = 2  # base delay in seconds
 
@@ -120,30 +203,21 @@ class AzureOpenAIInvocation(LLMInvocation):
                 chunks = []
                 try:
                     for chunk in response:
-                        print(
-                            chunk.choices[0].delta.content or "", end="", flush=True)
+                        if self.print_tokens:
+                            print(
+                                chunk.choices[0].delta.content or "", end="", flush=True)
                         chunks.append(chunk)
-                        time.sleep(0.01)
                 except Exception as e:
                     print(f"Error during streaming: {e}")
                 print("\n")
                 # fill complete content
                 full_content = "".join(
-                    chunk.choices[0].delta.content or "" 
+                    chunk.choices[0].delta.content or ""
                     for chunk in chunks
                 )
-                
+
                 # calculate token count
-                try:
-                    encoding = tiktoken.encoding_for_model(self.model)
-                    prompt_text = " ".join(msg["content"] for msg in messages)
-                    prompt_tokens = len(encoding.encode(prompt_text))
-                    completion_tokens = len(encoding.encode(full_content))
-                except Exception:
-                    # 如果tiktoken失败，回退到近似计算
-                    prompt_tokens = int(len(" ".join(msg["content"] for msg in messages).split()) * 1.3)
-                    completion_tokens = int(len(full_content.split()) * 1.3)
-                
+                prompt_tokens, completion_tokens = self.count_tokens(messages, full_content)
                 return (full_content, prompt_tokens, completion_tokens)
             except Exception as e:
                 delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
@@ -155,3 +229,19 @@ class AzureOpenAIInvocation(LLMInvocation):
 
         raise RuntimeError(
             "Max retries exceeded. Could not complete API call.")
+
+    def async_client(self):
+        import openai
+        return openai.AsyncAzureOpenAI(
+            azure_endpoint=self.base_url,
+            api_version=self.api_version,
+            api_key=self.ak,
+        )
+
+    async def acompletion(self, client, completion_params):
+        response = await client.chat.completions.create(**completion_params)
+        content = response.choices[0].message.content or ""
+        if response.usage:
+            return content, int(response.usage.prompt_tokens), int(response.usage.completion_tokens)
+        prompt_tokens, completion_tokens = self.count_tokens(completion_params["messages"], content)
+        return content, prompt_tokens, completion_tokens
@@ -31,3 +31,27 @@ def validate_and_map_model(model_name: str) -> str:
         print(f"Using custom model: {model_name}")
         return model_name
     return Models.SHORT_TO_FULL_MODEL_MAP[model_name]
+
+
+# context window of the models in tokens, used to budget the prompts
+CONTEXT_WINDOWS = {
+    Models.MISTRAL_MIXTRAL_8X7B_INSTRUCT_V0_1: 32000,
+    Models.META_LLAMA3_70B_INSTRUCT_V1_0: 8192,
+    Models.GPT_3_5_TURBO_0125: 16385,
+    Models.GPT_4O: 128000,
+    Models.GPT_4O_MINI: 128000,
+    Models.META_LLAMA3_1_405b_INSTRUCT_V1_0: 128000,
+    Models.META_LLAMA3_3_70b_INSTRUCT_V1_0: 128000,
+    Models.AZURE_GPT_4O: 128000,
+    Models.DEEPSEEK_R1: 64000,
+    Models.DEEPSEEK_V3: 64000,
+    Models.CLAUDE_3_5_HAIKU: 200000,
+    Models.MISTRAL_LARGE: 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 64000
+
+
+def get_context_window(model_name: str) -> int:
+    """Context window of the model, the short names are accepted too."""
+    model_name = Models.SHORT_TO_FULL_MODEL_MAP.get(model_name, model_name)
+    return CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+
+from .llm_invocation import LLMInvocation
+from ..panta_logger import pantaLogger
+
+CACHE_MODES = ("record", "replay", "bypass")
+# the cache directory may be shared by several processes, the size of the cache is read again from the
+# directory after this number of stored responses so the responses of the other processes are counted
+RESCAN_PUTS = 64
+logger = pantaLogger.initialize_logger(__name__)
+
+
+def response_key(model, prompt: dict, max_tokens, temperature):
+    content = json.dumps({
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "system": prompt.get("system", ""),
+        "user": prompt.get("user", ""),
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def occurrence_key(key, occurrence: int):
+    """
+    key of the n-th call of the same request in a run, the first call keeps the key of the request
+    """
+    return key if occurrence == 0 else hashlib.sha256(f"{key}:{occurrence}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk LLM response cache, one json file per response keyed by the hash of the request.
+    A request sent several times in a run (e.g. the retries) is stored once per occurrence,
+    so a replayed run gets the responses in the recorded order.
+    The cache is bounded by `max_mb`, the least recently used responses are evicted first
+    (the modification time of a file is updated on every hit).
+
+    mode:
+        record: always call the LLM and store the response
+        replay: return the stored response, call the LLM and store the response on a miss
+        bypass: do not use the cache
+    """
+
+    def __init__(self, cache_dir: str, mode: str = "replay", max_mb: int = 1024):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported LLM cache mode: {mode}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        self.puts_since_scan = 0
+        # number of calls of each request in the current run
+        self.occurrences = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def start_run(self):
+        with self.lock:
+            self.occurrences = {}
+
+    def next_key(self, key):
+        with self.lock:
+            occurrence = self.occurrences.get(key, 0)
+            self.occurrences[key] = occurrence + 1
+        return occurrence_key(key, occurrence)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        if self.mode != "replay":
+            return None
+        cache_file = self.path(key)
+        try:
+            with open(cache_file, "r") as f:
+                entry = json.load(f)
+            os.utime(cache_file)
+            return entry["response"], entry["prompt_tokens"], entry["completion_tokens"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, model, result):
+        """
+        store the response, a failure of the cache is logged and never fails the LLM call
+        """
+        if self.mode == "bypass":
+            return
+        try:
+            self.store(key, model, result)
+        except OSError as e:
+            logger.warning(f"Failed to cache the LLM response in {self.cache_dir}: {e}")
+
+    def store(self, key, model, result):
+        response, prompt_tokens, completion_tokens = result
+        cache_file = self.path(key)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        content = json.dumps({"model": model, "response": response, "prompt_tokens": prompt_tokens,
+                              "completion_tokens": completion_tokens})
+        with self.lock:
+            try:
+                previous_size = os.path.getsize(cache_file)
+            except FileNotFoundError:
+                previous_size = 0
+            with open(f"{cache_file}.{os.getpid()}.tmp", "w") as f:
+                f.write(content)
+            os.replace(f"{cache_file}.{os.getpid()}.tmp", cache_file)
+            self.puts_since_scan += 1
+            if self.total_bytes is None or self.puts_since_scan >= RESCAN_PUTS:
+                self.total_bytes = sum(size for _, _, size in self.entries())
+                self.puts_since_scan = 0
+            else:
+                self.total_bytes += len(content.encode()) - previous_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        """
+        :return: list of (path, modification time, size) of the stored responses, the files removed
+        meanwhile by another process are skipped
+        """
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            try:
+                shard_entries = list(os.scandir(shard.path))
+            except FileNotFoundError:
+                continue
+            for entry in shard_entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def evict(self):
+        """
+        remove the least recently used responses until the cache is at 90% of its limit
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[1])
+        self.total_bytes = sum(size for _, _, size in entries)
+        for cache_file, _, size in entries:
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+            self.total_bytes -= size
+            try:
+                os.remove(cache_file)
+            except FileNotFoundError:
+                # evicted by another process
+                pass
+        self.puts_since_scan = 0
+
+
+class CachedLLMInvocation:
+    """
+    Wrap an LLM invocation with the response cache, exposes the same interface as `LLMInvocation`.
+    """
+
+    def __init__(self, invoker: LLMInvocation, cache: ResponseCache):
+        self.invoker = invoker
+        self.cache = cache
+        self.model = invoker.model
+
+    def call_model(self, prompt: dict, max_tokens=4096, temperature=0.2):
+        key = self.cache.next_key(response_key(self.model, prompt, max_tokens, temperature))
+        result = self.cache.get(key)
+        if result is None:
+            result = self.invoker.call_model(prompt, max_tokens, temperature)
+            self.cache.put(key, self.model, result)
+        return result
+
+    def async_client(self):
+        return self.invoker.async_client()
+
+    async def acall_model(self, prompt: dict, max_tokens=4096, temperature=0.2, client=None):
+        key = self.cache.next_key(response_key(self.model, prompt, max_tokens, temperature))
+        result = self.cache.get(key)
+        if result is None:
+            result = await self.invoker.acall_model(prompt, max_tokens, temperature, client)
+            self.cache.put(key, self.model, result)
+        return result
+
+    acall_models = LLMInvocation.acall_models
+    call_models = LLMInvocation.call_models
+
+
+def with_response_cache(invoker: LLMInvocation, cache: ResponseCache = None):
+    if cache is None or cache.mode == "bypass":
+        return invoker
+    return CachedLLMInvocation(invoker, cache)
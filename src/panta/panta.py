@@ -4,13 +4,13 @@ import time
 
 from .panta_logger import pantaLogger
 from .model_invocation.models import validate_and_map_model
-from .command_executor import CommandExecutor
+from .model_invocation.response_cache import ResponseCache
+from .command_executor import get_command_executor
 from .report_generator import ReportGenerator
 from .unit_test_generator import UnitTestGenerator
 from .symprompt import SymPrompt
 from .templates import TEST_CLASS_JUNIT_3, TEST_CLASS_JUNIT_4, TEST_CLASS_JUNIT_5
-from .cfg.src.comex.codeviews.combined_graph.combined_driver import line_number_to_node_id_mapping
-from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
+from . import cfg_cache
 from .utils import read_file
 from .utils import get_code_language
 
@@ -22,9 +22,14 @@ def get_class_name(file_path):
 
 
 class Panta:
-    def __init__(self, args):
+    def __init__(self, args, test_dependencies=None, response_cache=None, llm_invoker=None):
+        """
+        test_dependencies, response_cache and llm_invoker are created from the args when they are not given,
+        the batch mode passes them to share them between the classes of a project.
+        """
         self.args = args
         self.logger = pantaLogger.initialize_logger(__name__)
+        cfg_cache.set_cache_dir(args.cfg_cache_dir)
         if args.run_symprompt:
             self.report_label = "_".join(['symprompt', args.model])
         else:
@@ -38,7 +43,15 @@ class Panta:
         except ValueError as e:
             self.logger.error(str(e))
             raise
-        self.test_dependencies = self.extract_test_dependency()
+        self.response_cache = response_cache
+        if self.response_cache is None and args.llm_cache_mode != "bypass":
+            self.response_cache = ResponseCache(args.llm_cache_dir, args.llm_cache_mode, args.llm_cache_max_mb)
+        elif self.response_cache is not None:
+            # the repeated requests are counted per run, the cache is shared by the runs of a batch
+            self.response_cache.start_run()
+        self.test_dependencies = test_dependencies
+        if self.test_dependencies is None:
+            self.test_dependencies = self.extract_test_dependency()
         self.validate_paths()
         self.duplicate_test_file()
 
@@ -57,6 +70,17 @@ class Panta:
             additional_instructions=args.additional_instructions,
             test_generation_strategy=args.test_generation_strategy,
             fix_type=args.fix_type,
+            junit_version=args.junit_version,
+            validation_mode=args.validation_mode,
+            batch_validation=args.batch_validation,
+            validation_workers=args.validation_workers,
+            executor_backend=args.executor_backend,
+            llm_print_tokens=args.llm_print_tokens,
+            response_cache=self.response_cache,
+            reject_redundant_tests=args.reject_redundant_tests,
+            prompt_token_budget=args.prompt_token_budget,
+            context_slicing=args.context_slicing,
+            llm_invoker=llm_invoker,
             llm_model=args.model)
 
     def extract_test_dependency(self):
@@ -68,7 +92,7 @@ class Panta:
         """
         try:
             stdout, stderr, exit_code, time_of_command, command_duration = (
-                CommandExecutor.run_command(
+                get_command_executor(self.args.executor_backend).run_command(
                     command=self.args.test_dependency_command, 
                     cwd=self.args.test_code_command_dir
                 )
@@ -113,10 +137,8 @@ class Panta:
         """
         language = get_code_language(self.args.source_code_file)
         src_code = read_file(self.args.source_code_file)
-        cfg_driver = CFGDriver(language, src_code)
-        _, node_id_to_line_numbers_mapping = line_number_to_node_id_mapping(
-            src_code, cfg_driver.CFG_nodes
-        )
+        cfg_driver = cfg_cache.get_cfg_driver(language, src_code)
+        _, node_id_to_line_numbers_mapping = cfg_cache.get_line_mapping(language, src_code)
         imports_lines = cfg_driver.file_obj["imports"]
         src_code_lines = src_code.split('\n')
         f = open(self.args.test_code_file, 'a')
@@ -184,8 +206,7 @@ class Panta:
                                                                             pick_two_paths=self.args.pick_two_paths)
                 token_count += gen_token_count
 
-                for generated_test in (generated_tests_dict.get("new_tests") or []):
-                    test_result = self.test_gen.validate_test(generated_test)
+                for test_result in self.test_gen.validate_generated_tests(generated_tests_dict.get("new_tests")):
                     test_result["label"] = g_label
                     test_results_list.append(test_result)
 
@@ -295,13 +316,17 @@ class Panta:
         self.test_gen.initial_test_suite_analysis_AST()
 
         symprompt = SymPrompt(project_dir=self.args.project_directory, source_code_file=self.args.source_code_file,
-                              llm_model=self.args.model, junit_version=self.args.junit_version)
+                              llm_model=self.args.model, junit_version=self.args.junit_version,
+                              executor_backend=self.args.executor_backend,
+                              llm_concurrency=self.args.llm_concurrency,
+                              llm_print_tokens=self.args.llm_print_tokens,
+                              response_cache=self.response_cache,
+                              context_slicing=self.args.context_slicing)
         symprompt.generate_test()
         generated_tests = symprompt.generated_tests
 
         for method in generated_tests.keys():
-            for index, g_test in enumerate(generated_tests[method]):
-                test_result = self.test_gen.validate_test(g_test)
+            for index, test_result in enumerate(self.test_gen.validate_generated_tests(generated_tests[method])):
                 test_result["label"] = f"{method}_{index}"
                 test_results_list.append(test_result)
         self.test_gen.run_coverage()
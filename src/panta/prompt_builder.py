@@ -2,9 +2,8 @@ import logging
 from .panta_logger import pantaLogger
 from .config_loader import get_settings
 from .templates import ADDITIONAL_INCLUDES_TEXT, ADDITIONAL_INSTRUCTIONS_TEXT, FAILED_TESTS_TEXT
-from jinja2 import Environment, StrictUndefined
-from .cfg.src.comex.codeviews.combined_graph.combined_driver import CombinedDriver
-from .cfg_branch_analyzer import CFGBranchAnalyzer
+from . import cfg_cache
+from .prompt_packer import PromptPacker, PromptSection
 import random
 
 from .utils import read_file
@@ -27,7 +26,9 @@ class PromptBuilder:
                  lines_missed=None,
                  branch_missed=None,
                  path_history=None,
-                 test_dependencies=""):
+                 test_dependencies="",
+                 prompt_packer=None,
+                 context_slicing=False):
         if lines_missed is None:
             lines_missed = []
         if branch_missed is None:
@@ -43,7 +44,7 @@ class PromptBuilder:
         self.code_coverage_report = code_coverage_report
         self.language = language
 
-        cfg_driver = CombinedDriver(src_language=self.language, src_code=self.source_file)
+        cfg_driver = cfg_cache.get_combined_driver(self.language, self.source_file)
         self.processed_source_code = cfg_driver.preprocessed_src_code
         self.cfg_obj = cfg_driver.file_obj
         self.cfg_node_to_line = cfg_driver.node_id_to_line_number
@@ -52,9 +53,15 @@ class PromptBuilder:
         self.branch_missed = branch_missed
         self.path_history = path_history
         self.test_dependencies = test_dependencies
+        # fits the control flow guided prompt in the token budget of the model, None disables the packing
+        self.prompt_packer = prompt_packer
+        # send only the slices of the methods under test instead of the whole source file
+        self.context_slicing = context_slicing
+        if self.context_slicing and self.prompt_packer is None:
+            self.prompt_packer = PromptPacker()
 
         # Initialize CFG branch analyzer
-        self.cfg_branch_analyzer = CFGBranchAnalyzer(self.language, self.source_file)
+        self.cfg_branch_analyzer = cfg_cache.get_branch_analyzer(self.language, self.source_file)
         self.cfa_guided_methods_under_test = self.extract_cfa_info_for_each_method_under_test()
 
         self.logger = pantaLogger.initialize_logger(__name__)
@@ -153,7 +160,8 @@ class PromptBuilder:
                 candidate_paths = self.generate_paths_to_be_covered(method, missed_lines, missed_branches)
             else:
                 candidate_paths = []
-            cfa_guided_methods.append((name, complexity, lines, missed_lines, candidate_paths))
+            cfa_guided_methods.append((name, complexity, lines, missed_lines, candidate_paths,
+                                       method["method_declaration"]["id"]))
 
         return sorted(cfa_guided_methods, key=lambda x: x[1], reverse=True)
 
@@ -237,6 +245,7 @@ class PromptBuilder:
             "branch_coverage_guidance": branch_coverage_guidance
         }
 
+        from jinja2 import Environment, StrictUndefined
         environment = Environment(undefined=StrictUndefined)
         try:
             system_prompt = environment.from_string(
@@ -244,6 +253,8 @@ class PromptBuilder:
             ).render(variables)
 
             rendered_templates = ""
+            # methods under test which have a path or missed lines in the prompt, with their rendered template
+            target_methods = []
             for method in self.cfa_guided_methods_under_test:
                 method_name = method[0]
                 method_complexity = method[1]
@@ -292,6 +303,12 @@ class PromptBuilder:
                         rendered_template = environment.from_string(template_str_missed_lines).render(
                             method_name=method_name, missed_lines=missed_lines)
                 rendered_templates += rendered_template
+                if rendered_template:
+                    target_methods.append((method, rendered_template))
+
+            if self.prompt_packer:
+                variables, rendered_templates = self.pack_prompt(environment, system_prompt, variables,
+                                                                 rendered_templates, target_methods)
 
             user_prompt = environment.from_string(
                 get_settings().test_generation_cfg_guided_prompt.user
@@ -306,6 +323,69 @@ class PromptBuilder:
         # print(f"#### user_prompt:\n\n{user_prompt}")
         return {"system": system_prompt, "user": user_prompt}
 
+    def source_pieces(self, target_methods) -> list:
+        """
+        cut the numbered source file into pieces by priority: each method under test, then the methods of the class
+        it calls transitively with the fields they reference, the class declaration with its constructors and
+        fields, a summary of the file made of the imports and the declaration line of the other members,
+        and the rest of the file.
+        With the context slicing, only the slices of the methods under test and the imports are kept.
+        :return: list of (priority, line indices), the method under test at index k has the priority (0, k, 0)
+        """
+        slicer = cfg_cache.get_context_slicer(self.language, self.source_file)
+        outline = slicer.outline
+        pieces = []
+        callee_lines, class_lines = set(), set(outline.class_lines)
+        for k, method in enumerate(target_methods):
+            context_slice = slicer.slice(method[5])
+            focal_lines = context_slice.focal.lines() if context_slice.focal else [line - 1 for line in method[2]]
+            pieces.append(((0, k, 0), focal_lines))
+            for member in context_slice.callees + context_slice.fields:
+                callee_lines.update(member.lines())
+            for member in context_slice.constructors:
+                class_lines.update(member.lines())
+        if self.context_slicing:
+            return pieces + [((1,), sorted(callee_lines)), ((2,), sorted(class_lines)), ((5,), outline.header)]
+
+        for member in outline.members_of_kind("field") + outline.members_of_kind("constructor"):
+            class_lines.update(member.lines())
+        summary_lines = outline.header + [member.declaration for member in outline.members]
+        all_lines = list(range(self.source_file_numbered.count("\n") + 1))
+        return pieces + [((1,), sorted(callee_lines)), ((2,), sorted(class_lines)), ((5,), sorted(summary_lines)),
+                         ((6,), all_lines)]
+
+    def pack_prompt(self, environment, system_prompt, variables, method_under_test, target_methods):
+        """
+        fit the sections of the control flow guided prompt in the token budget, by priority: each method under test
+        followed by its paths to cover, the methods they call, the fields and constructors, the end of the test
+        file, the failed tests and the test dependencies
+        :param target_methods: list of (method, rendered template) of the methods in `method_under_test`
+        :return: the variables and the paths to cover of the packed prompt
+        """
+        path_pieces = []
+        line = 0
+        for k, (_, rendered_template) in enumerate(target_methods):
+            line_count = rendered_template.count("\n")
+            path_pieces.append(((0, k, 1), list(range(line, line + line_count + 1))))
+            line += line_count
+        sections = [
+            PromptSection("source_file_numbered", self.source_file_numbered,
+                          pieces=self.source_pieces([method for method, _ in target_methods])),
+            PromptSection("method_under_test", method_under_test, pieces=path_pieces),
+            PromptSection("test_file", self.test_file, priority=(3,), keep="tail"),
+            PromptSection("failed_tests_section", variables["failed_tests_section"], priority=(4,)),
+            PromptSection("test_dependencies", variables["test_dependencies"], priority=(4,)),
+        ]
+        # the rest of the prompt is kept as is
+        empty_sections = {section.name: "" for section in sections}
+        frame = environment.from_string(get_settings().test_generation_cfg_guided_prompt.user).render(
+            variables, **empty_sections)
+        reserved_tokens = self.prompt_packer.count_tokens(system_prompt) + self.prompt_packer.count_tokens(frame)
+
+        packed = self.prompt_packer.pack(sections, reserved_tokens)
+        method_under_test = packed.pop("method_under_test")
+        return {**variables, **packed}, method_under_test
+
     def get_current_path_history(self):
         return self.path_history
 
@@ -352,6 +432,7 @@ class PromptBuilder:
             "language": self.language,
             "max_tests": MAX_TESTS_PER_RUN,
         }
+        from jinja2 import Environment, StrictUndefined
         environment = Environment(undefined=StrictUndefined)
         try:
             if coverage_enabled:
@@ -395,6 +476,7 @@ class PromptBuilder:
             "language": self.language,
             "max_tests": MAX_TESTS_PER_RUN,
         }
+        from jinja2 import Environment, StrictUndefined
         environment = Environment(undefined=StrictUndefined)
         try:
             system_prompt = environment.from_string(
@@ -419,6 +501,7 @@ class PromptBuilder:
             "failed_test_runs": self.failed_test_runs,
             "language": self.language
         }
+        from jinja2 import Environment, StrictUndefined
         environment = Environment(undefined=StrictUndefined)
         try:
             if fix_type == 'MCTS':
@@ -0,0 +1,143 @@
+"""
+Token budgeted packing of the prompt sections.
+A section is cut into pieces of lines with a priority. When the prompt does not fit in the token budget of the model,
+the pieces are added by priority while they fit, the piece which does not fit any more is truncated to its first
+(or last) lines, and the omitted lines are replaced by an elision line.
+The token counts are memoized per line, so the lines of the source and test files are counted once per run.
+"""
+import functools
+
+from .model_invocation.models import get_context_window
+from .panta_logger import pantaLogger
+
+ELISION = "..."
+# approximation of the token count when the tokenizer of the model is not available
+CHARS_PER_TOKEN = 4
+# the memoized token counts are dropped above this number of entries
+MAX_MEMOIZED_COUNTS = 200000
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """
+    :return: the tiktoken encoding of the model, None when tiktoken does not know the model or is not available
+    """
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+class PromptSection:
+    def __init__(self, name: str, text, pieces=None, priority=(0,), keep: str = "head"):
+        """
+        :param name: name of the template variable of the section
+        :param pieces: list of (priority, line indices), the lines which are in no piece are omitted when the
+        section is packed. By default the whole section is one piece of the given priority.
+        The priorities are tuples, lower first, so the pieces of different sections can be interleaved
+        :param keep: the lines kept when a piece does not fit, "head" or "tail"
+        """
+        self.name = name
+        self.text = text if isinstance(text, str) else str(text or "")
+        self.lines = self.text.split("\n") if self.text else []
+        self.keep = keep
+        if pieces is None:
+            pieces = [(priority, list(range(len(self.lines))))] if self.lines else []
+        self.pieces = pieces
+
+
+class PromptPacker:
+    def __init__(self, model: str = "", token_budget: int = 0, response_tokens: int = 4096):
+        """
+        :param token_budget: tokens of the prompt, 0 for the context window of the model minus the response tokens
+        """
+        self.model = model
+        self.token_budget = token_budget or get_context_window(model) - response_tokens
+        self.token_counts = {}
+        self._encoding = None
+        self._encoding_loaded = False
+        self.logger = pantaLogger.initialize_logger(__name__)
+
+    @property
+    def encoding(self):
+        if not self._encoding_loaded:
+            self._encoding = get_encoding(self.model) if self.model else None
+            self._encoding_loaded = True
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        count = self.token_counts.get(text)
+        if count is None:
+            if self.encoding is not None:
+                count = len(self.encoding.encode(text, disallowed_special=()))
+            else:
+                count = -(-len(text) // CHARS_PER_TOKEN)
+            if len(self.token_counts) >= MAX_MEMOIZED_COUNTS:
+                self.token_counts.clear()
+            self.token_counts[text] = count
+        return count
+
+    def line_tokens(self, line: str) -> int:
+        # the line and its line break
+        return self.count_tokens(line) + 1
+
+    def truncate(self, section: PromptSection, lines: list, budget: int) -> list:
+        """
+        :return: the first (or last) lines of the piece which fit in the budget
+        """
+        kept = []
+        ordered = reversed(lines) if section.keep == "tail" else lines
+        for index in ordered:
+            cost = self.line_tokens(section.lines[index])
+            if cost > budget:
+                break
+            budget -= cost
+            kept.append(index)
+        return sorted(kept)
+
+    def render(self, section: PromptSection, included: set) -> str:
+        lines = []
+        previous = -1
+        for index in sorted(included):
+            if index > previous + 1:
+                lines.append(ELISION)
+            lines.append(section.lines[index])
+            previous = index
+        if previous < len(section.lines) - 1:
+            lines.append(ELISION)
+        return "\n".join(lines)
+
+    def pack(self, sections: list, reserved_tokens: int = 0) -> dict:
+        """
+        :param reserved_tokens: tokens of the rest of the prompt
+        :return: dict of the section name to its packed text, the sections are unchanged when their pieces cover
+        all their lines and fit in the budget
+        """
+        budget = self.token_budget - reserved_tokens
+        piece_lines = [{index for _, lines in section.pieces for index in lines} for section in sections]
+        total = sum(self.line_tokens(section.lines[index])
+                    for order, section in enumerate(sections) for index in piece_lines[order])
+        if total <= budget:
+            return {section.name: self.render(section, piece_lines[order]) for order, section in enumerate(sections)}
+
+        # an elision line is reserved for each piece, it separates the piece from the omitted lines
+        pieces = sorted(((priority, order, lines) for order, section in enumerate(sections)
+                         for priority, lines in section.pieces), key=lambda piece: piece[:2])
+        remaining = budget - len(pieces) * self.line_tokens(ELISION)
+        included = [set() for _ in sections]
+        for _, order, lines in pieces:
+            section = sections[order]
+            lines = [index for index in lines if index not in included[order]]
+            cost = sum(self.line_tokens(section.lines[index]) for index in lines)
+            if cost > remaining:
+                lines = self.truncate(section, lines, remaining)
+                cost = sum(self.line_tokens(section.lines[index]) for index in lines)
+            included[order].update(lines)
+            remaining -= cost
+
+        packed = {section.name: self.render(section, included[order]) for order, section in enumerate(sections)}
+        self.logger.info(f"Prompt of {total + reserved_tokens} tokens packed into the budget of {self.token_budget} "
+                         f"tokens, kept lines: " + ", ".join(f"{section.name} {len(included[order])}/{len(section.lines)}"
+                                                              for order, section in enumerate(sections)))
+        return packed
@@ -1,6 +1,3 @@
-from jinja2 import Template
-
-
 class ReportGenerator:
     @staticmethod
     def get_html_template() -> str:
@@ -113,6 +110,7 @@ class ReportGenerator:
 
     @classmethod
     def generate_report(cls, results, file_path):
+        from jinja2 import Template
         template = Template(cls.get_html_template())
         html_content = template.render(results=results)
 
@@ -0,0 +1,99 @@
+"""
+Outline of a source file read from its tree-sitter tree: the line ranges of the package and import declarations,
+of the top level class and of each of its members, used to cut the source file into pieces of the prompt.
+"""
+import bisect
+import functools
+
+from .cfg.src.comex.tree_parser.language_registry import registry
+
+# node types of the source file structure
+NODE_TYPES = {
+    "java": {
+        "header": ("package_declaration", "import_declaration"),
+        "class": ("class_declaration", "interface_declaration", "enum_declaration"),
+        "comment": ("comment", "line_comment", "block_comment"),
+        "members": {"field_declaration": "field", "constructor_declaration": "constructor",
+                    "method_declaration": "method"},
+    },
+}
+
+
+class Member:
+    __slots__ = ("kind", "name", "start", "declaration", "end", "names")
+
+    def __init__(self, kind: str, name: str, start: int, declaration: int, end: int, names=()):
+        """
+        :param start: first line of the member (0-based), its leading comments included
+        :param declaration: first line of the declaration (0-based), after the comments
+        :param end: last line of the member (0-based)
+        :param names: the variables declared by a field
+        """
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.declaration = declaration
+        self.end = end
+        self.names = tuple(names)
+
+    def lines(self) -> list:
+        return list(range(self.start, self.end + 1))
+
+
+class SourceOutline:
+    def __init__(self, language: str, source_code: str):
+        # the file is a single piece when the language is not supported
+        self.header = []
+        self.class_lines = []
+        self.members = []
+        self.member_starts = []
+        if language not in NODE_TYPES:
+            return
+        node_types = NODE_TYPES[language]
+        tree = registry.parse(language, source_code)
+        clz = None
+        for node in tree.root_node.children:
+            if node.type in node_types["header"]:
+                self.header.extend(range(node.start_point[0], node.end_point[0] + 1))
+            elif node.type in node_types["class"] and clz is None:
+                clz = node
+        body = clz.child_by_field_name("body") if clz else None
+        if body is None:
+            return
+        # class declaration up to the opening brace, and the closing brace
+        self.class_lines = list(range(clz.start_point[0], body.start_point[0] + 1)) + [body.end_point[0]]
+        comment_start = None
+        for node in body.named_children:
+            if node.type in node_types["comment"]:
+                if comment_start is None:
+                    comment_start = node.start_point[0]
+                continue
+            name = node.child_by_field_name("name")
+            start = comment_start if comment_start is not None else node.start_point[0]
+            names = [declarator.child_by_field_name("name").text.decode("utf8")
+                     for declarator in node.children_by_field_name("declarator")]
+            self.members.append(Member(node_types["members"].get(node.type, "other"),
+                                       name.text.decode("utf8") if name else "", start, node.start_point[0],
+                                       node.end_point[0], names))
+            comment_start = None
+        self.member_starts = [member.start for member in self.members]
+
+    def member_at(self, line: int):
+        """
+        :param line: 0-based line number
+        :return: the member containing the line, or None
+        """
+        if not self.members:
+            return None
+        index = bisect.bisect_right(self.member_starts, line) - 1
+        if index >= 0 and line <= self.members[index].end:
+            return self.members[index]
+        return None
+
+    def members_of_kind(self, kind: str) -> list:
+        return [member for member in self.members if member.kind == kind]
+
+
+@functools.lru_cache(maxsize=16)
+def get_source_outline(language: str, source_code: str) -> SourceOutline:
+    return SourceOutline(language, source_code)
@@ -1,14 +1,14 @@
+import asyncio
 import logging
 from .panta_logger import pantaLogger
 from .config_loader import get_settings
-from jinja2 import Environment, StrictUndefined
-from .cfg.src.comex.codeviews.combined_graph.combined_driver import CombinedDriver, line_number_to_node_id_mapping
-from .cfg.src.comex.tree_parser.parser_driver import pre_process_src_code
-from .command_executor import CommandExecutor
+from . import cfg_cache
+from .command_executor import get_command_executor
 from .templates import TEST_CLASS_JUNIT_4_IMPORTS, TEST_CLASS_JUNIT_3_IMPORTS, TEST_CLASS_JUNIT_5_IMPORTS
 from .utils import read_file
 from .yaml_parser_utils import load_yaml
 from .model_invocation.llm_invocation import LLMInvocation
+from .model_invocation.response_cache import with_response_cache
 from .utils import get_code_language
 
 MAX_TESTS_PER_RUN = 4
@@ -41,17 +41,26 @@ class SymPrompt:
                  project_dir: str,
                  source_code_file: str,
                  llm_model: str,
-                 junit_version: int):
+                 junit_version: int,
+                 executor_backend: str = "subprocess",
+                 llm_concurrency: int = 1,
+                 llm_print_tokens: bool = True,
+                 response_cache=None,
+                 context_slicing: bool = False):
 
         self.prompt = {}
         self.project_dir = project_dir
         self.source_code_file = source_code_file
+        self.command_executor = get_command_executor(executor_backend)
         self.source_file_name = source_code_file.split("/")[-1]
         self.language = get_code_language(source_code_file)
         self.source_file = read_file(source_code_file)
-        cfg_driver = CombinedDriver(src_language=self.language, src_code=self.source_file)
+        cfg_driver = cfg_cache.get_combined_driver(self.language, self.source_file)
         self.cfg_obj = cfg_driver.file_obj
         self.cfg_node_to_line = cfg_driver.node_id_to_line_number
+        # focal method, its transitive callees in the class, the referenced fields and the constructors
+        self.context_slicer = cfg_cache.get_context_slicer(self.language, self.source_file) \
+            if context_slicing else None
         self.methods_under_test_with_paths = self.extract_paths_for_each_method_under_test()
         self.focal_class_context = self.generate_focal_class_context()
         self.generated_tests = {}
@@ -63,11 +72,14 @@ class SymPrompt:
             self.test_context = self.extract_test_dependency() + f"\n{TEST_CLASS_JUNIT_4_IMPORTS}"
 
         self.logger = pantaLogger.initialize_logger(__name__)
-        self.llm_invoker = LLMInvocation(model=llm_model)
+        self.llm_invoker = with_response_cache(LLMInvocation(model=llm_model, print_tokens=llm_print_tokens),
+                                               response_cache)
+        # number of methods under test whose prompts are sent to the LLM concurrently
+        self.llm_concurrency = llm_concurrency
 
     def extract_test_dependency(self):
         try:
-            stdout, stderr, exit_code, time_of_command, command_duration = CommandExecutor.run_command(
+            stdout, stderr, exit_code, time_of_command, command_duration = self.command_executor.run_command(
                 command="mvn dependency:list -DexcludeTransitive=true | grep ':test'", cwd=self.project_dir
             )
             output = ""
@@ -83,16 +95,30 @@ class SymPrompt:
             return ""
 
     def generate_focal_class_context(self):
+        from .cfg.src.comex.tree_parser.parser_driver import pre_process_src_code
         src_code_lines = self.source_file.split('\n')
-        clz_obj = self.cfg_obj["class_objects"][0]
-        first_method = clz_obj['methods_under_test'][0]
-        first_method_start_id = first_method['method_declaration']['id']
-        first_method_start_line = self.cfg_node_to_line[first_method_start_id][0] - 1
-        focal_context_lines = "\n".join(src_code_lines[:first_method_start_line])
+        if self.context_slicer:
+            outline = self.context_slicer.outline
+            # the package, the imports and the class declaration, the members are in the context of each method
+            context_lines = sorted(set(outline.header + outline.class_lines[:-1]))
+            focal_context_lines = "\n".join(src_code_lines[line] for line in context_lines)
+        else:
+            clz_obj = self.cfg_obj["class_objects"][0]
+            first_method = clz_obj['methods_under_test'][0]
+            first_method_start_id = first_method['method_declaration']['id']
+            first_method_start_line = self.cfg_node_to_line[first_method_start_id][0] - 1
+            focal_context_lines = "\n".join(src_code_lines[:first_method_start_line])
         focal_context_lines = pre_process_src_code(self.language, focal_context_lines)
         return focal_context_lines
 
     def generate_focal_method_context(self, method):
+        """
+        :return: the class methods called by the method, and the method itself. With context slicing, the
+        fields, constructors and class methods needed by the method, and the method itself.
+        """
+        if self.context_slicer:
+            return self.generate_sliced_method_context(method)
+        from .cfg.src.comex.tree_parser.parser_driver import pre_process_src_code
         src_code_lines = self.source_file.split('\n')
         paths = method["paths"]
         method_calls_in_class = set()
@@ -125,6 +151,24 @@ class SymPrompt:
         focal_method_lines = pre_process_src_code(self.language, focal_method_lines)
         return methods_in_class, focal_method_lines
 
+    def generate_sliced_method_context(self, method):
+        from .cfg.src.comex.tree_parser.parser_driver import pre_process_src_code
+        context_slice = self.context_slicer.slice(method['method_declaration']['id'])
+        class_members = "\n".join(
+            pre_process_src_code(self.language, self.context_slicer.member_source(member))
+            for member in context_slice.context_members())
+
+        if context_slice.focal:
+            focal_method_lines = self.context_slicer.member_source(context_slice.focal)
+        else:
+            src_code_lines = self.source_file.split('\n')
+            focal_method_nodes = method['method_declaration']['nodes']
+            focal_start_line = self.cfg_node_to_line[focal_method_nodes[0]][0] - 1
+            focal_end_line = self.cfg_node_to_line[focal_method_nodes[-1]][-1] - 1
+            focal_method_lines = "\n".join(src_code_lines[focal_start_line:focal_end_line + 1])
+        focal_method_lines = pre_process_src_code(self.language, focal_method_lines)
+        return class_members, focal_method_lines
+
     def extract_paths_for_each_method_under_test(self):
         # there may be multiple classes defined in the file, we focus on the outer class for now
         clz_obj = self.cfg_obj["class_objects"][0]
@@ -143,6 +187,9 @@ class SymPrompt:
         return methods_with_paths
 
     def generate_test(self, max_tokens=4096):
+        if self.llm_concurrency > 1:
+            asyncio.run(self.agenerate_test(max_tokens))
+            return
         for method in self.methods_under_test_with_paths:
             # method is (name, complexity, method_label, method_value, candidate_paths, method_calls, focal_method)
             method_name = method[0]
@@ -162,12 +209,42 @@ class SymPrompt:
                 if 'single_test' in generated_test and generated_test['single_test']:
                     self.generated_tests[method_label].extend(generated_test['single_test'])
 
+    async def agenerate_test(self, max_tokens=4096):
+        """
+        the prompts of different methods are sent concurrently, the paths of one method stay sequential
+        because the prompt of a path includes the tests generated for the previous paths.
+        """
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+        client = self.llm_invoker.async_client()
+
+        async def generate_method_tests(method):
+            method_name, _, method_label, method_signiture, candidate_paths, method_calls_in_class, \
+                focal_method_lines = method
+            self.generated_tests[method_label] = []
+            for path in candidate_paths:
+                prompt = self.build_prompt_for_each_path(method_name, method_signiture, method_label,
+                                                         method_calls_in_class, focal_method_lines, path)
+                async with semaphore:
+                    response, prompt_token_count, response_token_count = await self.llm_invoker.acall_model(
+                        prompt=prompt, max_tokens=max_tokens, client=client)
+                generated_test = self.parse_response(response, prompt_token_count + response_token_count)
+                if 'single_test' in generated_test and generated_test['single_test']:
+                    self.generated_tests[method_label].extend(generated_test['single_test'])
+
+        try:
+            await asyncio.gather(*[generate_method_tests(method) for method in self.methods_under_test_with_paths])
+        finally:
+            if client is not None:
+                await client.close()
+
     def generate_test_by_prompt_llm(self, prompt: dict, max_tokens=4096):
         response, prompt_token_count, response_token_count = (
             self.llm_invoker.call_model(prompt=prompt,
                                         max_tokens=max_tokens))
-        self.logger.info(f"Total token count for LLM {self.llm_invoker.model}: "
-                         f"{prompt_token_count + response_token_count}")
+        return self.parse_response(response, prompt_token_count + response_token_count)
+
+    def parse_response(self, response, token_count):
+        self.logger.info(f"Total token count for LLM {self.llm_invoker.model}: {token_count}")
         try:
             tests_dict = load_yaml(response, keys_fix_yaml=["test_code",
                                                             "test_name",
@@ -195,6 +272,7 @@ class SymPrompt:
             "source_file_name": self.source_file_name,
             "source_file": self.source_file
         }
+        from jinja2 import Environment, StrictUndefined
         environment = Environment(undefined=StrictUndefined)
         try:
             system_prompt = environment.from_string(
@@ -0,0 +1,121 @@
+"""
+Live model of the test file under generation, backed by a tree-sitter tree.
+The insertions of the generated tests and their rollbacks are applied as tree edits followed by an incremental
+reparse, so the insertion points, the indentation and the names of the tests are read from the tree
+instead of analysing the whole test file again after each test.
+"""
+from .cfg.src.comex.tree_parser.language_registry import registry
+
+# node types of the test file structure
+NODE_TYPES = {
+    "java": {"import": "import_declaration", "class": "class_declaration", "method": "method_declaration"},
+}
+
+
+class TestFileModel:
+    def __init__(self, language: str, content: str):
+        if language not in NODE_TYPES:
+            raise ValueError(f"Unsupported language for the test file model: {language}")
+        self.language = language
+        self.node_types = NODE_TYPES[language]
+        self.source = content.encode("utf8")
+        self._content = content
+        self.tree = registry.parse(language, self.source)
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self.source.decode("utf8")
+        return self._content
+
+    def last_import(self):
+        for node in reversed(self.tree.root_node.children):
+            if node.type == self.node_types["import"]:
+                return node
+        return None
+
+    def test_class(self):
+        for node in self.tree.root_node.children:
+            if node.type == self.node_types["class"]:
+                return node
+        return None
+
+    def methods(self) -> list:
+        test_class = self.test_class()
+        body = test_class.child_by_field_name("body") if test_class else None
+        if body is None:
+            return []
+        return [node for node in body.children if node.type == self.node_types["method"]]
+
+    def test_methods(self) -> list:
+        # test methods are public methods or default access
+        return [method for method in self.methods() if not method.text.startswith((b"private", b"protected"))]
+
+    def test_names(self) -> list:
+        return [method.child_by_field_name("name").text.decode("utf8") for method in self.test_methods()]
+
+    def line_start_byte(self, node) -> int:
+        return self.source.rfind(b"\n", 0, node.start_byte) + 1
+
+    def insertion_points(self):
+        """
+        :return: (line number after which the imports are inserted, line number before which the tests are inserted,
+        indentation of the tests), the values are None when the test file has no import or no test method
+        """
+        last_import = self.last_import()
+        imports_after = last_import.end_point[0] + 1 if last_import else None
+        methods = self.test_methods()
+        if not methods:
+            return imports_after, None, None
+        line_start = self.line_start_byte(methods[-1])
+        line_end = self.source.find(b"\n", line_start)
+        line = self.source[line_start:line_end if line_end != -1 else len(self.source)]
+        return imports_after, methods[-1].start_point[0] + 1, len(line) - len(line.lstrip(b" "))
+
+    def insert(self, start_byte: int, start_row: int, text: str) -> tuple:
+        """
+        insert the text at the start of the line `start_row` (0-based)
+        :return: the edit, to be given to `rollback`
+        """
+        inserted = text.encode("utf8")
+        lines = inserted.split(b"\n")
+        self.tree.edit(start_byte=start_byte, old_end_byte=start_byte, new_end_byte=start_byte + len(inserted),
+                       start_point=(start_row, 0), old_end_point=(start_row, 0),
+                       new_end_point=(start_row + len(lines) - 1, len(lines[-1])))
+        self.apply(self.source[:start_byte] + inserted + self.source[start_byte:])
+        return start_byte, start_row, inserted
+
+    def remove(self, edit: tuple):
+        start_byte, start_row, inserted = edit
+        lines = inserted.split(b"\n")
+        self.tree.edit(start_byte=start_byte, old_end_byte=start_byte + len(inserted), new_end_byte=start_byte,
+                       start_point=(start_row, 0), old_end_point=(start_row + len(lines) - 1, len(lines[-1])),
+                       new_end_point=(start_row, 0))
+        self.apply(self.source[:start_byte] + self.source[start_byte + len(inserted):])
+
+    def apply(self, source: bytes):
+        self.source = source
+        self._content = None
+        self.tree = registry.parse(self.language, self.source, self.tree)
+
+    def add_test(self, test_code: str, additional_imports: str = "") -> list:
+        """
+        insert the test before the last test method, and its imports after the last import
+        when they are not in the test file yet.
+        :param test_code: the indented test code
+        :return: the edits of the insertion, empty if the test file has no test method
+        """
+        methods = self.test_methods()
+        if not test_code or not methods:
+            return []
+        edits = [self.insert(self.line_start_byte(methods[-1]), methods[-1].start_point[0], test_code + "\n")]
+        last_import = self.last_import()
+        if last_import and additional_imports and additional_imports not in self.content:
+            line_end = self.source.find(b"\n", last_import.end_byte)
+            if line_end != -1:
+                edits.append(self.insert(line_end + 1, last_import.end_point[0] + 1, additional_imports + "\n"))
+        return edits
+
+    def rollback(self, edits: list):
+        for edit in reversed(edits):
+            self.remove(edit)
@@ -1,30 +1,25 @@
 import json
 import os
-import re
 
-from .command_executor import CommandExecutor
-from .coverage.jacoco_coverage import JacocoCoverage
-from .coverage.pycov_coverage import PycovCoverage
-from .error_message_parser import extract_error_message, extract_compilation_error_message_java
+from .command_executor import get_command_executor
+from .error_message_parser import extract_error_message, extract_compilation_error_message_java, \
+    extract_compilation_error_lines_java, extract_test_failure_messages_java, parse_surefire_test_results
 from .file_preprocessor import FilePreprocessor
+from .incremental_validator import PANTA_CACHE_DIR, IncrementalValidator, extract_package_name, get_test_method_name, \
+    parse_test_results
 from .panta_logger import pantaLogger
 from .model_invocation.llm_invocation import LLMInvocation, AzureOpenAIInvocation
+from .model_invocation.response_cache import with_response_cache
 from .prompt_builder import PromptBuilder
+from .prompt_packer import PromptPacker
+from .test_file_model import TestFileModel
 from .utils import get_code_language
+from .validation_pool import ValidationPool
 from .yaml_parser_utils import load_yaml
-from .cfg.src.comex.codeviews.combined_graph.combined_driver import line_number_to_node_id_mapping
-from .cfg.src.comex.codeviews.CFG.CFG_driver import CFGDriver
-from .cfg_branch_analyzer import CFGBranchAnalyzer
+from . import cfg_cache
 from .utils import read_file
 
 
-def count_leading_spaces(text):
-    match = re.match(r'^ +', text)
-    if match:
-        return len(match.group(0))
-    return 0
-
-
 def failed_test_to_string(failed_test: dict):
     failed_test_str = ""
     failed_test_dict = failed_test.get("code", {})
@@ -59,12 +54,25 @@ class UnitTestGenerator:
                  prompt_type: str = "baseline",
                  additional_instructions: str = "",
                  test_generation_strategy: str = "cfg_branch_analyzer",
-                 fix_type: str = "fix"):
+                 fix_type: str = "fix",
+                 junit_version: int = 4,
+                 validation_mode: str = "full",
+                 batch_validation: bool = False,
+                 validation_workers: int = 1,
+                 executor_backend: str = "subprocess",
+                 llm_print_tokens: bool = True,
+                 response_cache=None,
+                 reject_redundant_tests: bool = False,
+                 prompt_token_budget: int = 0,
+                 context_slicing: bool = False,
+                 llm_invoker=None):
 
         self.relevant_line_number_to_insert_tests_after = None
         self.relevant_line_number_to_insert_imports_after = None
         self.relevant_line_number_to_insert_tests_before = None
         self.test_headers_indentation = None
+        # tree-sitter model of the test file, updated incrementally with the accepted tests
+        self.test_file_model = None
         self.lines_missed = None
         self.branch_missed = None
         self.current_coverage = None
@@ -83,20 +91,58 @@ class UnitTestGenerator:
         self.language = get_code_language(source_code_file)
         self.test_generation_strategy = test_generation_strategy
         self.fix_type = fix_type
+        self.validation_mode = validation_mode
+        self.batch_validation = batch_validation
+        # reject the passing tests that do not cover any new line or branch
+        self.reject_redundant_tests = reject_redundant_tests
+        self.covered_bits = (0, 0)
+        # in the canonical project, the sandboxes of the validation pool are removed at the end of the run
+        self.redundant_tests_dir = os.path.join(test_code_command_dir, PANTA_CACHE_DIR, "redundant_tests")
+        # packs the control flow guided prompt into the token budget, the token counts are kept between iterations
+        self.prompt_packer = PromptPacker(llm_model, prompt_token_budget)
+        # send the slices of the methods under test instead of the whole source file
+        self.context_slicing = context_slicing
+        self.command_executor = get_command_executor(executor_backend)
 
         # TODO: 填写OpenAIInvocation的参数
         # self.llm_invoker = LLMInvocation(model=llm_model)
-        self.llm_invoker = AzureOpenAIInvocation(
-            model=llm_model,
-            base_url=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-            ak=os.getenv("AZURE_OPENAI_API_KEY"),
-        )
+        # the batch mode shares the invoker (and its client) between the classes
+        self.llm_invoker = llm_invoker
+        if self.llm_invoker is None:
+            self.llm_invoker = AzureOpenAIInvocation(
+                model=llm_model,
+                base_url=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                ak=os.getenv("AZURE_OPENAI_API_KEY"),
+                print_tokens=llm_print_tokens,
+            )
+            self.llm_invoker = with_response_cache(self.llm_invoker, response_cache)
 
         self.logger = pantaLogger.initialize_logger(__name__)
         self.logger.info(f"Using test generation strategy: {self.test_generation_strategy}")
         self.logger.info(f"Using fix type: {self.fix_type}")
-        
+        self.logger.info(f"Using validation mode: {self.validation_mode}")
+        self.logger.info(f"Using executor backend: {executor_backend}")
+
+        # incremental mode compiles the test class and runs only the new test method,
+        # the full test execution command is still used by `run_coverage`
+        if self.validation_mode == "incremental":
+            self.incremental_validator = IncrementalValidator(
+                project_dir=self.project_dir,
+                test_code_file=self.test_code_file,
+                test_code_command_dir=self.test_code_command_dir,
+                junit_version=junit_version,
+                command_executor=self.command_executor)
+        else:
+            self.incremental_validator = None
+
+        # validate the tests of one response concurrently in sandbox copies of the project
+        self.validation_pool = ValidationPool(self, validation_workers)
+        if self.validation_pool.available():
+            self.logger.info(f"Using {validation_workers} validation workers")
+        else:
+            self.validation_pool = None
+
         self.preprocessor = FilePreprocessor(self.test_code_file)
         self.failed_test_runs = []
         self.coverage_invalid_tests = []
@@ -108,7 +154,7 @@ class UnitTestGenerator:
         
         # Initialize CFG branch analyzer if needed
         if self.test_generation_strategy == "cfg_branch_analyzer":
-            self.cfg_branch_analyzer = CFGBranchAnalyzer(
+            self.cfg_branch_analyzer = cfg_cache.get_branch_analyzer(
                 self.language, read_file(self.source_code_file)
             )
         else:
@@ -121,7 +167,7 @@ class UnitTestGenerator:
         self.logger.info(f'generate baseline coverage report: "{self.test_execution_command}"')
         try:
             stdout, stderr, exit_code, time_of_test_execution_command, command_duration = (
-                CommandExecutor.run_command(
+                self.command_executor.run_command(
                     command=self.test_execution_command, 
                     cwd=self.test_code_command_dir
                 )
@@ -137,17 +183,7 @@ class UnitTestGenerator:
                 )
 
             # Instantiate Coverage and process the coverage report
-            if self.coverage_type == "jacoco":
-                coverage_processor = JacocoCoverage(
-                    project_dir=self.project_dir,
-                    file_path=self.code_coverage_report_path,
-                    src_file_path=self.source_code_file)
-            elif self.coverage_type == "pycov":
-                coverage_processor = PycovCoverage(
-                    file_path=self.code_coverage_report_path,
-                    src_file_path=self.source_code_file)
-            else:
-                raise ValueError(f"Unsupported coverage type: {self.coverage_type}")
+            coverage_processor = self.create_coverage_processor()
 
             # Use the process_coverage_report method of Coverage, 
             # passing in the time the test command was executed
@@ -166,6 +202,13 @@ class UnitTestGenerator:
                     f"Line coverage: {round(line_percentage * 100, 2)}%\n"
                     f"Branch coverage: {round(branch_percentage * 100, 2)}%"
                 )
+                if self.reject_redundant_tests:
+                    try:
+                        self.covered_bits = coverage_processor.parse_covered_bitsets()
+                    except NotImplementedError:
+                        self.logger.warning(f"Coverage type {self.coverage_type} does not support "
+                                            f"the rejection of redundant tests.")
+                        self.reject_redundant_tests = False
             except AssertionError as error:
                 self.logger.error(f"Error in coverage processing: {error}")
                 raise
@@ -177,6 +220,83 @@ class UnitTestGenerator:
             self.logger.error(str(e))
             raise
 
+    def create_coverage_processor(self):
+        # the coverage parsers are imported for the coverage type in use only
+        if self.coverage_type == "jacoco":
+            from .coverage.jacoco_coverage import JacocoCoverage
+            return JacocoCoverage(
+                project_dir=self.project_dir,
+                file_path=self.code_coverage_report_path,
+                src_file_path=self.source_code_file)
+        elif self.coverage_type == "jacoco_exec":
+            from .coverage.jacoco_exec_coverage import JacocoExecCoverage
+            return JacocoExecCoverage(
+                project_dir=self.project_dir,
+                file_path=self.code_coverage_report_path,
+                src_file_path=self.source_code_file)
+        elif self.coverage_type == "pycov":
+            from .coverage.pycov_coverage import PycovCoverage
+            return PycovCoverage(
+                file_path=self.code_coverage_report_path,
+                src_file_path=self.source_code_file)
+        else:
+            raise ValueError(f"Unsupported coverage type: {self.coverage_type}")
+
+    def test_adds_coverage(self, time_of_command) -> bool:
+        """
+        compare the lines/branches covered with the new test with the ones covered before.
+        The coverage report of the validation run is used, in incremental mode the test command is run first.
+        :return: False if the new test does not cover any new line or branch
+        """
+        if self.incremental_validator and self.incremental_validator.available:
+            _, _, exit_code, time_of_command, _ = self.command_executor.run_command(
+                command=self.test_execution_command, cwd=self.test_code_command_dir
+            )
+            if exit_code != 0:
+                return True
+        try:
+            coverage_processor = self.create_coverage_processor()
+            coverage_processor.verify_report_update(time_of_command)
+            line_bits, branch_bits = coverage_processor.parse_covered_bitsets()
+        except (AssertionError, ValueError, NotImplementedError, OSError) as e:
+            self.logger.warning(f"Cannot compute the coverage of the new test: {e}")
+            return True
+
+        old_line_bits, old_branch_bits = self.covered_bits
+        if not (line_bits & ~old_line_bits) and not (branch_bits & ~old_branch_bits):
+            return False
+        self.covered_bits = (old_line_bits | line_bits, old_branch_bits | branch_bits)
+        return True
+
+    def save_redundant_test(self, generated_test: dict):
+        """
+        keep the tests which do not add coverage in a side file, outside the test sources
+        """
+        os.makedirs(self.redundant_tests_dir, exist_ok=True)
+        imports = (generated_test.get("new_imports_code", "") or "").strip()
+        text = f"// imports: {imports}\n" if imports else ""
+        text += generated_test.get("test_code", "").rstrip() + "\n\n"
+        # a single append, the workers of the validation pool share the file
+        with open(os.path.join(self.redundant_tests_dir, os.path.basename(self.test_code_file)), "a") as f:
+            f.write(text)
+
+    def redundant_details(self, generated_test, exit_code, stderr):
+        self.save_redundant_test(generated_test)
+        self.coverage_invalid_tests.append({
+            "code": generated_test,
+            "error_message": "Code coverage did not increase",
+        })
+        return {
+            "status": "PASS",
+            "reason": "Coverage did not increase",
+            "exit_code": exit_code,
+            "stderr": stderr,
+            "stdout": "",
+            "test": generated_test,
+            "line_coverage": round(self.current_coverage[0] * 100, 2),
+            "branch_coverage": round(self.current_coverage[1] * 100, 2)
+        }
+
     @staticmethod
     def get_included_files(included_files):
         """
@@ -257,7 +377,9 @@ class UnitTestGenerator:
             lines_missed=self.lines_missed,
             branch_missed=self.branch_missed,
             path_history=self.path_history,
-            test_dependencies=self.test_dependencies
+            test_dependencies=self.test_dependencies,
+            prompt_packer=self.prompt_packer,
+            context_slicing=self.context_slicing
         )
         
         # CFG guided test generation strategy
@@ -350,22 +472,10 @@ class UnitTestGenerator:
         :return:
         """
 
-        test_code = read_file(self.test_code_file)
-        cfg_driver = CFGDriver(self.language, test_code, {"test_code": True})
-        _, node_id_to_line_numbers_mapping = line_number_to_node_id_mapping(test_code, cfg_driver.CFG_nodes)
-        last_import_id = cfg_driver.file_obj["imports"][-1]["id"]
-        last_line_for_imports = node_id_to_line_numbers_mapping[last_import_id][-1]
-
-        class_obj = cfg_driver.file_obj["class_objects"][0]
-        class_declaration_id = class_obj["class_declaration"]["id"]
-        class_declaration_start_line = node_id_to_line_numbers_mapping[class_declaration_id][0]
-
-        last_method_declaration = class_obj["methods_under_test"][-1]
-        last_method_start_id = last_method_declaration["method_declaration"]["id"]
-        last_method_start_line = node_id_to_line_numbers_mapping[last_method_start_id][0]
-        test_code_lines = test_code.split('\n')
-        method_line_str = test_code_lines[last_method_start_line - 1]
-        indents = count_leading_spaces(method_line_str)
+        self.test_file_model = TestFileModel(self.language, read_file(self.test_code_file))
+        last_line_for_imports, last_method_start_line, indents = self.test_file_model.insertion_points()
+        if last_method_start_line is None:
+            raise ValueError(f"No test method found in the test file {self.test_code_file}")
 
         self.test_headers_indentation = indents
         self.relevant_line_number_to_insert_tests_before = last_method_start_line
@@ -415,8 +525,7 @@ class UnitTestGenerator:
         with open(self.test_code_file, "r") as test_file:
             original_content = test_file.read()  # Store original content
         try:
-            processed_test, relevant_line_number_to_insert_imports_after, \
-            relevant_line_number_to_insert_tests_before = self.add_new_test_to_test_file(generated_test, original_content)
+            processed_test, edits = self.add_test_to_model(generated_test, original_content)
             if processed_test:
                 with open(self.test_code_file, "w") as test_file:
                     test_file.write(processed_test)
@@ -430,16 +539,12 @@ class UnitTestGenerator:
                 #     )
                 # else:
                 # Now try to run the test so that we can check if the newly added test is valid
-                self.logger.info(f'Run test with the command: "{self.test_execution_command}"')
-                stdout, stderr, exit_code, time_of_command, command_duration = CommandExecutor.run_command(
-                    command=self.test_execution_command, cwd=self.test_code_command_dir, timeout=60
-                )
+                stdout, stderr, exit_code, time_of_command, command_duration = self.run_test_command(generated_test)
 
                 # Now we need to check if we were able to run the test successfully or not
                 if exit_code != 0:
                     # As the test failed, we go back to the test file with the original content
-                    with open(self.test_code_file, "w") as test_file:
-                        test_file.write(original_content)
+                    self.restore_test_file(original_content, edits)
                     if "COMPILATION ERROR" in stdout or "Compilation failed" in stdout:
                         self.logger.info(f"Test generated with compilation error.")
                         error_message = extract_compilation_error_message_java(stdout)
@@ -569,6 +674,11 @@ class UnitTestGenerator:
                 #     f"Test generated which has passed and coverage increased. "
                 #     f"Now current coverages are Line: {round(new_line_coverage * 100, 2)}%, Branch: {round(new_branch_coverage * 100, 2)}%"
                 # )
+                if self.reject_redundant_tests and not self.test_adds_coverage(time_of_command):
+                    self.logger.info("Generated test passed but it did not increase coverage.")
+                    self.restore_test_file(original_content, edits)
+                    return self.redundant_details(generated_test, exit_code, stderr)
+
                 self.logger.info(f"Generated test has passed: {test_name}")
                 pass_details = {
                     "status": "PASS",
@@ -581,13 +691,15 @@ class UnitTestGenerator:
                     "branch_coverage": round(self.current_coverage[1] * 100, 2)
                 }
 
-                self.relevant_line_number_to_insert_tests_before = relevant_line_number_to_insert_tests_before
-                self.relevant_line_number_to_insert_imports_after = relevant_line_number_to_insert_imports_after
+                self.relevant_line_number_to_insert_imports_after, \
+                    self.relevant_line_number_to_insert_tests_before, _ = self.test_file_model.insertion_points()
                 return pass_details
         except Exception as e:
             self.logger.error(f"Error validating test: {e}")
             with open(self.test_code_file, "w") as test_file:
                 test_file.write(original_content)
+            # the model is parsed again from the test file by the next validation
+            self.test_file_model = None
             return {
                 "status": "FAIL",
                 "reason": f"Error validating test: {e}",
@@ -599,8 +711,264 @@ class UnitTestGenerator:
                 "branch_coverage": round(self.current_coverage[1] * 100, 2)
             }
 
-    def add_new_test_to_test_file(self, generated_test: dict, original_content):
-        processed_test = ""
+    def validate_generated_tests(self, generated_tests: list) -> list:
+        """
+        Validate the tests generated from one LLM response, concurrently if validation workers are configured,
+        or in a single build if batch validation is enabled.
+        """
+        generated_tests = generated_tests or []
+        if self.validation_pool:
+            return self.validation_pool.validate_tests(generated_tests)
+        if self.batch_validation:
+            return self.validate_tests(generated_tests)
+        return [self.validate_test(generated_test) for generated_test in generated_tests]
+
+    def validate_tests(self, generated_tests: list) -> list:
+        """
+        Batch validation: insert all the generated tests at once and run the build once.
+        Compilation errors and test failures are attributed to the individual tests,
+        the tests are bisected only when a failure cannot be attributed.
+        The redundant tests are rejected per group: the tests which pass together are rejected
+        when they do not add any line or branch coverage together.
+
+        Returns:
+            list: the validation result of each generated test, in the same order as `generated_tests`
+        """
+        if len(generated_tests) <= 1:
+            return [self.validate_test(generated_test) for generated_test in generated_tests]
+
+        with open(self.test_code_file, "r") as test_file:
+            original_content = test_file.read()
+        results = {}
+        try:
+            base = (original_content, self.relevant_line_number_to_insert_imports_after,
+                    self.relevant_line_number_to_insert_tests_before)
+            content, imports_after, tests_before = self.validate_test_group(
+                generated_tests, list(range(len(generated_tests))), base, results)
+            with open(self.test_code_file, "w") as test_file:
+                test_file.write(content)
+            self.relevant_line_number_to_insert_imports_after = imports_after
+            self.relevant_line_number_to_insert_tests_before = tests_before
+        except Exception as e:
+            self.logger.error(f"Error validating tests in batch: {e}")
+            with open(self.test_code_file, "w") as test_file:
+                test_file.write(original_content)
+            remaining = [i for i in range(len(generated_tests)) if i not in results]
+            for i in remaining:
+                results[i] = self.validate_test(generated_tests[i])
+
+        passed = len([result for result in results.values() if result["status"] == "PASS"])
+        self.logger.info(f"Batch validation: {passed}/{len(generated_tests)} generated tests passed.")
+        return [results[i] for i in range(len(generated_tests))]
+
+    def validate_test_group(self, generated_tests, indices, base, results):
+        """
+        Validate a group of tests on top of the `base` test file with a single build.
+        :param base: tuple (content, relevant_line_number_to_insert_imports_after, relevant_line_number_to_insert_tests_before)
+        :param results: dict {index: validation result}, filled for all the `indices`
+        :return: the new base, which includes the tests that passed
+        """
+        if len(indices) == 1:
+            return self.validate_single_test_of_group(generated_tests, indices[0], base, results)
+
+        content, ranges, imports_after, tests_before = self.insert_tests_to_test_file(
+            [generated_tests[i] for i in indices], base)
+        with open(self.test_code_file, "w") as test_file:
+            test_file.write(content)
+        test_names = [get_test_method_name(generated_tests[i]) for i in indices]
+        stdout, stderr, exit_code, time_of_command, command_duration = self.run_batch_command(test_names)
+
+        if exit_code == 0:
+            if self.reject_redundant_tests and not self.test_adds_coverage(time_of_command):
+                self.logger.info("Generated tests passed together but they did not increase coverage.")
+                for i in indices:
+                    results[i] = self.redundant_details(generated_tests[i], exit_code, stderr)
+                return base
+            for i in indices:
+                results[i] = self.pass_details(generated_tests[i], exit_code, stderr)
+            return content, imports_after, tests_before
+
+        if "COMPILATION ERROR" in stdout or "Compilation failed" in stdout:
+            errors = extract_compilation_error_lines_java(stdout, os.path.basename(self.test_code_file))
+            failed = {}
+            for line_number, error_lines in errors.items():
+                owner = next((indices[k] for k, (start, end) in enumerate(ranges) if start <= line_number <= end),
+                             None)
+                if owner is None:
+                    # error outside the generated tests, e.g. in the new imports
+                    failed = {}
+                    break
+                failed.setdefault(owner, []).extend(error_lines)
+            if failed:
+                for i, error_lines in failed.items():
+                    self.logger.info(f"Test generated with compilation error.")
+                    results[i] = self.failure_details(generated_tests[i], "Compilation failure", exit_code, stderr,
+                                                      "\n".join(error_lines))
+                remaining = [i for i in indices if i not in failed]
+                if not remaining:
+                    return base
+                return self.validate_test_group(generated_tests, remaining, base, results)
+            return self.bisect_test_group(generated_tests, indices, base, results)
+
+        test_results = self.collect_batch_test_results(stdout, time_of_command)
+        if test_results is None or any(name not in test_results for name in test_names) \
+                or len(set(test_names)) != len(test_names):
+            # timeout or the failures cannot be attributed to the tests
+            return self.bisect_test_group(generated_tests, indices, base, results)
+
+        passed = []
+        for i, test_name in zip(indices, test_names):
+            error_message = test_results[test_name]
+            if error_message is None:
+                results[i] = self.pass_details(generated_tests[i], 0, stderr)
+                passed.append(i)
+            else:
+                self.logger.info(f"Test generated failed due to runtime error.")
+                results[i] = self.failure_details(generated_tests[i], "Test failures", exit_code, stderr,
+                                                  error_message or "Test failures")
+        if not passed:
+            return base
+        if self.reject_redundant_tests:
+            # the coverage report includes the failed tests, the passed tests are run again without them
+            return self.validate_test_group(generated_tests, passed, base, results)
+        # the passed tests were built together, no need to run the build again
+        content, _, imports_after, tests_before = self.insert_tests_to_test_file(
+            [generated_tests[i] for i in passed], base)
+        return content, imports_after, tests_before
+
+    def bisect_test_group(self, generated_tests, indices, base, results):
+        middle = len(indices) // 2
+        base = self.validate_test_group(generated_tests, indices[:middle], base, results)
+        return self.validate_test_group(generated_tests, indices[middle:], base, results)
+
+    def validate_single_test_of_group(self, generated_tests, index, base, results):
+        content, imports_after, tests_before = base
+        with open(self.test_code_file, "w") as test_file:
+            test_file.write(content)
+        self.relevant_line_number_to_insert_imports_after = imports_after
+        self.relevant_line_number_to_insert_tests_before = tests_before
+        results[index] = self.validate_test(generated_tests[index])
+        with open(self.test_code_file, "r") as test_file:
+            content = test_file.read()
+        return content, self.relevant_line_number_to_insert_imports_after, \
+            self.relevant_line_number_to_insert_tests_before
+
+    def insert_tests_to_test_file(self, generated_tests, base):
+        """
+        insert the tests one after another into the base content
+        :return: (content, line ranges of the inserted tests, imports_after, tests_before)
+        """
+        content, imports_after, tests_before = base
+        ranges = []
+        for generated_test in generated_tests:
+            processed_test, new_imports_after, new_tests_before = self.add_new_test_to_test_file(
+                generated_test, content, tests_before, imports_after)
+            if not processed_test:
+                ranges.append((0, -1))
+                continue
+            inserted_imports = (new_imports_after or 0) - (imports_after or 0)
+            # the new imports shift the tests inserted before
+            ranges = [(start + inserted_imports, end + inserted_imports) for start, end in ranges]
+            ranges.append((tests_before + inserted_imports, new_tests_before - 1))
+            content, imports_after, tests_before = processed_test, new_imports_after, new_tests_before
+        return content, ranges, imports_after, tests_before
+
+    def run_batch_command(self, test_names):
+        if self.incremental_validator and all(test_names) and self.incremental_validator.prepare():
+            self.logger.info(f'Run tests incrementally: "{", ".join(test_names)}"')
+            return self.incremental_validator.run_tests(test_names, timeout=60 * len(test_names))
+
+        self.logger.info(f'Run tests with the command: "{self.test_execution_command}"')
+        return self.command_executor.run_command(
+            command=self.test_execution_command, cwd=self.test_code_command_dir, timeout=60 * len(test_names)
+        )
+
+    def collect_batch_test_results(self, stdout, time_of_command):
+        """
+        :return: dict {test_name: None if passed else error message}, None if the results are not available
+        """
+        if time_of_command is None or "Timeout" in stdout:
+            return None
+        if self.incremental_validator and self.incremental_validator.available:
+            passed = parse_test_results(stdout)
+            failures = extract_test_failure_messages_java(stdout)
+            return {name: None if ok else failures.get(name, "") for name, ok in passed.items()}
+
+        test_class = os.path.splitext(os.path.basename(self.test_code_file))[0]
+        package_name = extract_package_name(read_file(self.test_code_file))
+        if package_name:
+            test_class = f"{package_name}.{test_class}"
+        report_file = os.path.join(self.test_code_command_dir, "target", "surefire-reports", f"TEST-{test_class}.xml")
+        if not os.path.isfile(report_file) or os.path.getmtime(report_file) * 1000 < time_of_command:
+            return None
+        return {name: (message or None) for name, message in parse_surefire_test_results(report_file).items()}
+
+    def pass_details(self, generated_test, exit_code, stderr):
+        self.logger.info(f"Generated test has passed: {generated_test.get('test_name')}")
+        return {
+            "status": "PASS",
+            "reason": "",
+            "exit_code": exit_code,
+            "stderr": stderr,
+            "stdout": "",
+            "test": generated_test,
+            "line_coverage": round(self.current_coverage[0] * 100, 2),
+            "branch_coverage": round(self.current_coverage[1] * 100, 2)
+        }
+
+    def failure_details(self, generated_test, reason, exit_code, stderr, error_message):
+        self.failed_test_runs.append({
+            "code": generated_test,
+            "error_message": error_message
+        })
+        return {
+            "status": "FAIL",
+            "reason": reason,
+            "exit_code": exit_code,
+            "stderr": stderr,
+            "stdout": error_message,
+            "test": generated_test,
+            "line_coverage": round(self.current_coverage[0] * 100, 2),
+            "branch_coverage": round(self.current_coverage[1] * 100, 2)
+        }
+
+    def run_test_command(self, generated_test=None):
+        """
+        Run the generated test, only the new test method is compiled and executed in incremental mode.
+        The method is selected by the name declared in the test code, the `test_name` of the LLM may differ.
+        Falls back to the test execution command if the incremental mode is not available.
+        """
+        test_name = get_test_method_name(generated_test) if generated_test else ""
+        if self.incremental_validator and test_name and self.incremental_validator.prepare():
+            self.logger.info(f'Run test incrementally: "{test_name}"')
+            return self.incremental_validator.run_test(test_name, timeout=60)
+
+        self.logger.info(f'Run test with the command: "{self.test_execution_command}"')
+        return self.command_executor.run_command(
+            command=self.test_execution_command, cwd=self.test_code_command_dir, timeout=60
+        )
+
+    def restore_test_file(self, original_content, edits):
+        with open(self.test_code_file, "w") as test_file:
+            test_file.write(original_content)
+        self.test_file_model.rollback(edits)
+
+    def add_test_to_model(self, generated_test: dict, original_content):
+        """
+        insert the test into the model of the test file, the model is parsed again only when it is not
+        in sync with the content, e.g. when the test file was written from the base of a batch.
+        :return: (the content with the test, the edits to roll the insertion back)
+        """
+        if self.test_file_model is None or self.test_file_model.content != original_content:
+            self.test_file_model = TestFileModel(self.language, original_content)
+        test_code_indented, additional_imports = self.prepare_test_code(generated_test)
+        edits = self.test_file_model.add_test(test_code_indented, additional_imports)
+        return (self.test_file_model.content if edits else ""), edits
+
+    def prepare_test_code(self, generated_test: dict):
+        """
+        :return: (the test code with the indentation of the test file, the additional imports)
+        """
         test_code = generated_test.get("test_code", "").rstrip()
         additional_imports = (generated_test.get("new_imports_code", "") or "").strip()
         if additional_imports and additional_imports[0] == '"' and additional_imports[-1] == '"':
@@ -610,9 +978,6 @@ class UnitTestGenerator:
         if additional_imports and additional_imports == '""':
             additional_imports = ""
 
-        relevant_line_number_to_insert_tests_before = self.relevant_line_number_to_insert_tests_before
-        relevant_line_number_to_insert_imports_after = self.relevant_line_number_to_insert_imports_after
-
         needed_indent = self.test_headers_indentation
 
         # now we will remove the initial indent of test code, and insert the needed indent
@@ -625,6 +990,21 @@ class UnitTestGenerator:
                     [delta_indent * " " + line for line in test_code.split("\n")]
                 )
         test_code_indented = "\n" + test_code_indented.strip("\n") + "\n"
+        return test_code_indented, additional_imports
+
+    def add_new_test_to_test_file(self, generated_test: dict, original_content,
+                                  relevant_line_number_to_insert_tests_before=None,
+                                  relevant_line_number_to_insert_imports_after=None):
+        """
+        insert the test into the given content, the tests of a batch are inserted one after another
+        into the base of the batch without going through the model of the test file.
+        """
+        processed_test = ""
+        test_code_indented, additional_imports = self.prepare_test_code(generated_test)
+        if relevant_line_number_to_insert_tests_before is None:
+            relevant_line_number_to_insert_tests_before = self.relevant_line_number_to_insert_tests_before
+        if relevant_line_number_to_insert_imports_after is None:
+            relevant_line_number_to_insert_imports_after = self.relevant_line_number_to_insert_imports_after
 
         if test_code_indented and relevant_line_number_to_insert_tests_before:
             original_content_lines = original_content.split("\n")
@@ -684,8 +1064,7 @@ class UnitTestGenerator:
                 fixed_tests, tokens = self.generate_test_by_prompt_llm(fixing_prompt, max_tokens)
                 iter_count += 1
                 token_count += tokens
-                for fixed_test in fixed_tests.get("new_tests", []):
-                    test_result = self.validate_test(fixed_test)
+                for test_result in self.validate_generated_tests(fixed_tests.get("new_tests", [])):
                     test_result['label'] = f"{f_label}_{iter_count}"
                     fix_results_list.append(test_result)
             except Exception as e:
@@ -0,0 +1,211 @@
+import atexit
+import copy
+import os
+import queue
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .incremental_validator import IncrementalValidator, get_test_method_name
+from .panta_logger import pantaLogger
+
+# directories which are written by the build, they are copied instead of hardlinked into the sandboxes
+BUILD_OUTPUT_DIRS = ("target",)
+IGNORED_DIRS = (".git",)
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ValidationPool:
+    """
+    Validate generated tests concurrently, each worker owns a sandbox copy of the project.
+    The sources are hardlinked into the sandboxes, the build output and the test file are copied,
+    so nothing written in a sandbox reaches the original project.
+    Only the tests which pass in a sandbox are merged back into the canonical test file.
+    """
+
+    def __init__(self, test_gen, workers: int):
+        self.test_gen = test_gen
+        self.workers = workers
+        self.logger = pantaLogger.initialize_logger(__name__)
+        self.sandbox_root = None
+        self.validators = None
+        self.command_dir = os.path.abspath(test_gen.test_code_command_dir)
+        self.test_file_relpath = os.path.relpath(os.path.abspath(test_gen.test_code_file), self.command_dir)
+
+    def available(self) -> bool:
+        return self.workers > 1 and not self.test_file_relpath.startswith(os.pardir)
+
+    def create_sandboxes(self):
+        self.sandbox_root = tempfile.mkdtemp(prefix="panta_sandbox_")
+        atexit.register(self.close)
+        self.validators = queue.Queue()
+        for index in range(self.workers):
+            sandbox_dir = os.path.join(self.sandbox_root, f"worker{index}")
+            self.logger.info(f"Create validation sandbox: {sandbox_dir}")
+            self.copy_project(sandbox_dir)
+            self.validators.put(self.create_validator(sandbox_dir))
+
+    def copy_project(self, sandbox_dir):
+        shutil.copytree(self.command_dir, sandbox_dir, copy_function=link_or_copy, symlinks=True,
+                        ignore=shutil.ignore_patterns(*(BUILD_OUTPUT_DIRS + IGNORED_DIRS)))
+        for build_dir in BUILD_OUTPUT_DIRS:
+            if os.path.isdir(os.path.join(self.command_dir, build_dir)):
+                shutil.copytree(os.path.join(self.command_dir, build_dir), os.path.join(sandbox_dir, build_dir),
+                                symlinks=True)
+        # the test file is rewritten in place by the validation, it must not share the inode with the original
+        sandbox_test_file = os.path.join(sandbox_dir, self.test_file_relpath)
+        os.remove(sandbox_test_file)
+        shutil.copy2(os.path.join(self.command_dir, self.test_file_relpath), sandbox_test_file)
+
+    def sandbox_path(self, path, sandbox_dir):
+        """
+        :return: the path inside the sandbox of a path of the project, None if it is outside the command directory
+        """
+        relpath = os.path.relpath(os.path.abspath(path), self.command_dir)
+        if relpath.startswith(os.pardir):
+            return None
+        return os.path.normpath(os.path.join(sandbox_dir, relpath))
+
+    def create_validator(self, sandbox_dir):
+        validator = copy.copy(self.test_gen)
+        validator.test_code_command_dir = sandbox_dir
+        validator.test_code_file = os.path.join(sandbox_dir, self.test_file_relpath)
+        # the coverage of a sandbox build is read from the report written in the sandbox
+        validator.project_dir = self.sandbox_path(self.test_gen.project_dir, sandbox_dir) or self.test_gen.project_dir
+        coverage_report_path = self.sandbox_path(self.test_gen.code_coverage_report_path, sandbox_dir)
+        if coverage_report_path:
+            validator.code_coverage_report_path = coverage_report_path
+        elif self.test_gen.reject_redundant_tests:
+            self.logger.warning(f"The coverage report {self.test_gen.code_coverage_report_path} is outside "
+                                f"{self.command_dir}, the redundant tests cannot be rejected in the sandboxes.")
+            validator.reject_redundant_tests = False
+        validator.failed_test_runs = []
+        # each worker parses its own copy of the test file
+        validator.test_file_model = None
+        if self.test_gen.incremental_validator:
+            validator.incremental_validator = IncrementalValidator(
+                project_dir=sandbox_dir,
+                test_code_file=validator.test_code_file,
+                test_code_command_dir=sandbox_dir,
+                junit_version=self.test_gen.incremental_validator.junit_version,
+                command_executor=self.test_gen.command_executor)
+        return validator
+
+    def validate_tests(self, generated_tests: list) -> list:
+        """
+        Returns:
+            list: the validation result of each generated test, in the same order as `generated_tests`
+        """
+        if len(generated_tests) <= 1:
+            return [self.test_gen.validate_test(generated_test) for generated_test in generated_tests]
+        if self.validators is None:
+            self.create_sandboxes()
+
+        with open(self.test_gen.test_code_file, "r") as test_file:
+            base_content = test_file.read()
+        base = (base_content, self.test_gen.relevant_line_number_to_insert_imports_after,
+                self.test_gen.relevant_line_number_to_insert_tests_before)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            validations = list(executor.map(lambda generated_test: self.validate_in_sandbox(generated_test, base),
+                                            generated_tests))
+        results = [result for result, _ in validations]
+        tests_covered_bits = [covered_bits for _, covered_bits in validations]
+
+        # the tests passed without increasing the coverage are not merged
+        passed = [index for index, result in enumerate(results) if result["status"] == "PASS" and not result["reason"]]
+        covered_bits = self.test_gen.covered_bits
+        if self.test_gen.reject_redundant_tests:
+            passed, covered_bits = self.reject_overlapping_tests(generated_tests, passed, results, tests_covered_bits)
+        self.logger.info(f"Parallel validation: {len(passed)}/{len(generated_tests)} generated tests passed.")
+        if passed:
+            self.merge_passed_tests(generated_tests, passed, base, results, covered_bits)
+        return results
+
+    def validate_in_sandbox(self, generated_test, base):
+        content, imports_after, tests_before = base
+        validator = self.validators.get()
+        try:
+            with open(validator.test_code_file, "w") as test_file:
+                test_file.write(content)
+            validator.relevant_line_number_to_insert_imports_after = imports_after
+            validator.relevant_line_number_to_insert_tests_before = tests_before
+            validator.failed_test_runs = []
+            validator.coverage_invalid_tests = []
+            validator.covered_bits = self.test_gen.covered_bits
+            result = validator.validate_test(generated_test)
+            self.test_gen.failed_test_runs.extend(validator.failed_test_runs)
+            self.test_gen.coverage_invalid_tests.extend(validator.coverage_invalid_tests)
+            # the bits are unchanged when the coverage of the test could not be read
+            covered_bits = validator.covered_bits if validator.covered_bits != self.test_gen.covered_bits else None
+            return result, covered_bits
+        finally:
+            self.validators.put(validator)
+
+    def reject_overlapping_tests(self, generated_tests, passed, results, tests_covered_bits):
+        """
+        the sandboxes compare the tests with the coverage of the previous round only, the tests of this round
+        which add no coverage to the tests merged before them are rejected.
+        :param tests_covered_bits: the bits covered in the sandbox of each test, None when unknown
+        :return: the tests to merge and the bits covered with them
+        """
+        line_bits, branch_bits = self.test_gen.covered_bits
+        merged = []
+        for index in passed:
+            covered_bits = tests_covered_bits[index]
+            if covered_bits is not None:
+                if not (covered_bits[0] & ~line_bits) and not (covered_bits[1] & ~branch_bits):
+                    self.logger.info("Generated test passed but it did not increase coverage over the other tests.")
+                    results[index] = self.test_gen.redundant_details(
+                        generated_tests[index], results[index]["exit_code"], results[index]["stderr"])
+                    continue
+                line_bits |= covered_bits[0]
+                branch_bits |= covered_bits[1]
+            merged.append(index)
+        return merged, (line_bits, branch_bits)
+
+    def merge_passed_tests(self, generated_tests, passed, base, results, covered_bits):
+        """
+        insert the passed tests into the canonical test file and confirm them with one more run,
+        if the tests do not pass together, they are validated again one by one.
+        """
+        test_gen = self.test_gen
+        content, _, imports_after, tests_before = test_gen.insert_tests_to_test_file(
+            [generated_tests[index] for index in passed], base)
+        with open(test_gen.test_code_file, "w") as test_file:
+            test_file.write(content)
+
+        test_names = [get_test_method_name(generated_tests[index]) for index in passed]
+        stdout, stderr, exit_code, _, _ = test_gen.run_batch_command(test_names)
+        if exit_code == 0:
+            if test_gen.reject_redundant_tests:
+                self.merge_covered_bits(covered_bits)
+            test_gen.relevant_line_number_to_insert_imports_after = imports_after
+            test_gen.relevant_line_number_to_insert_tests_before = tests_before
+            return
+
+        self.logger.info("The tests passed in the sandboxes fail together, validate them one by one.")
+        with open(test_gen.test_code_file, "w") as test_file:
+            test_file.write(base[0])
+        for index in passed:
+            results[index] = test_gen.validate_test(generated_tests[index])
+
+    def merge_covered_bits(self, covered_bits):
+        """
+        the bits of the merged tests are pushed back to the validators, so the next round compares with them
+        """
+        self.test_gen.covered_bits = covered_bits
+        for validator in list(self.validators.queue):
+            validator.covered_bits = covered_bits
+
+    def close(self):
+        if self.sandbox_root and os.path.isdir(self.sandbox_root):
+            shutil.rmtree(self.sandbox_root, ignore_errors=True)
+        self.sandbox_root = None
+        self.validators = None